@@ -13,7 +13,7 @@ from django import forms
 import json
 import re
 class CoordenadasField(forms.CharField):
-    """Campo personalizado que acepta 'lat, lng' y convierte a GeoJSON"""
+    """Campo personalizado que acepta 'lat, lng' y convierte a GeoJSON ([lng, lat])"""
     
     def to_python(self, value):
         if not value:
@@ -36,7 +36,7 @@ class CoordenadasField(forms.CharField):
                     if -90 <= lat <= 90 and -180 <= lng <= 180:
                         return {
                             'type': 'Point',
-                            'coordinates': [lat, lng]
+                            'coordinates': [lng, lat]  # GeoJSON: primero la longitud
                         }
                     else:
                         raise forms.ValidationError('Latitud debe estar entre -90 y 90, Longitud entre -180 y 180')
@@ -51,7 +51,7 @@ class CoordenadasField(forms.CharField):
         if isinstance(value, dict) and value.get('type') == 'Point':
             coordinates = value.get('coordinates', [])
             if len(coordinates) == 2:
-                return f"{coordinates[0]}, {coordinates[1]}"
+                return f"{coordinates[1]}, {coordinates[0]}"
         return value
     
 ################################Modelo USER-SOCIAL
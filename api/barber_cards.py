@@ -0,0 +1,170 @@
+"""
+Colección derivada 'barber_cards': un documento compacto por barbería activa.
+
+Los listados, búsquedas y rankings leen de aquí (con índices propios) en lugar
+de recorrer 'api_user' y escarbar en User.barberia[0]. Se mantiene desde las
+señales de User, Comment y Servicio, y se puede reconstruir completa con
+`python manage.py rebuild_barber_cards`.
+"""
+from datetime import datetime, timezone
+
+from bson.decimal128 import Decimal128
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, ReplaceOne
+
+from .models import User, Comment, Servicio
+from .mongo import coleccion
+
+COLECCION = 'barber_cards'
+
+# Campos que necesita una tarjeta del listado (?view=card)
+PROYECCION_CARD = {
+    'username': 1, 'profile_imagen': 1, 'location': 1, 'name': 1, 'address': 1,
+    'rating': 1, 'comments_count': 1, 'services_count': 1, 'min_price': 1,
+    'min_price_currency': 1, 'working_days': 1,
+}
+
+# Campos de User de los que sale la tarjeta (un save() que no toca ninguno no la cambia)
+CAMPOS_USER_TARJETA = frozenset({'username', 'profile_imagen', 'is_active', 'ubicacion_coordenadas', 'barberia'})
+# Campos de la tarjeta que salen del propio User (los contadores salen de Comment y Servicio)
+CAMPOS_DE_USUARIO = ('username', 'profile_imagen', 'name', 'address', 'rating', 'working_days', 'location')
+
+INDICES = [
+    ([('location', GEOSPHERE)], 'card_location_2dsphere'),
+    ([('rating', DESCENDING), ('_id', ASCENDING)], 'card_rating_cursor'),
+    ([('name', ASCENDING)], 'card_name'),
+    ([('comments_count', DESCENDING)], 'card_comments_count'),
+    ([('services_count', DESCENDING)], 'card_services_count'),
+    ([('min_price', ASCENDING)], 'card_min_price'),
+    ([('working_days', ASCENDING)], 'card_working_days'),
+]
+
+
+def tarjetas():
+    return coleccion(COLECCION)
+
+
+def asegurar_indices():
+    collection = tarjetas()
+    for claves, nombre in INDICES:
+        collection.create_index(claves, name=nombre)
+
+
+def _precio(valor):
+    if isinstance(valor, Decimal128):
+        valor = valor.to_decimal()
+    return float(valor) if valor is not None else None
+
+
+def construir_tarjeta(user, comentarios=0, servicios=0, precio_minimo=None):
+    """Arma el documento de la tarjeta, o None si el usuario no es una barbería activa."""
+    perfil = user.barberia[0] if user.barberia and isinstance(user.barberia[0], dict) else None
+    if not user.is_active or perfil is None:
+        return None
+
+    horario = perfil.get('horario') or [{}]
+    tarjeta = {
+        '_id': user.pk,
+        'username': user.username,
+        'profile_imagen': user.profile_imagen.name if user.profile_imagen else None,
+        'name': perfil.get('name_barber'),
+        'address': perfil.get('address'),
+        'rating': perfil.get('rating'),
+        'comments_count': comentarios,
+        'services_count': servicios,
+        'min_price': _precio(precio_minimo[0]) if precio_minimo else None,
+        'min_price_currency': precio_minimo[1] if precio_minimo else None,
+        'working_days': horario[0].get('days', []) if isinstance(horario[0], dict) else [],
+        'updated_at': datetime.now(timezone.utc),
+    }
+    coords = (user.ubicacion_coordenadas or {}).get('coordinates') if isinstance(user.ubicacion_coordenadas, dict) else None
+    if coords and len(coords) == 2:
+        tarjeta['location'] = {'type': 'Point', 'coordinates': list(coords)}
+    return tarjeta
+
+
+def datos_de_usuario(user):
+    """Parte de la tarjeta que sale del User, o None si no es una barbería activa."""
+    tarjeta = construir_tarjeta(user)
+    if tarjeta is None:
+        return None
+    return {campo: tarjeta.get(campo) for campo in CAMPOS_DE_USUARIO}
+
+
+def tarjeta_al_dia(user, datos):
+    """True si la tarjeta guardada ya tiene 'datos' (una consulta chica, sin contar comentarios ni servicios)."""
+    guardada = tarjetas().find_one({'_id': user.pk}, dict.fromkeys(CAMPOS_DE_USUARIO, 1))
+    return guardada is not None and all(guardada.get(campo) == valor for campo, valor in datos.items())
+
+
+def actualizar_tarjeta(barberia):
+    """Recalcula y guarda la tarjeta de una barbería (instancia de User o su id)."""
+    if not isinstance(barberia, User):
+        barberia = User.objects.filter(pk=barberia).first()
+        if barberia is None:
+            return
+
+    comentarios = Comment.objects.filter(barberia_id=barberia.pk).count()
+    servicios = Servicio.objects.filter(barberia_id=barberia.pk)
+    mas_barato = servicios.filter(precio__isnull=False).order_by('precio').values_list('precio', 'moneda').first()
+
+    tarjeta = construir_tarjeta(barberia, comentarios, servicios.count(), mas_barato)
+    if tarjeta is None:
+        eliminar_tarjeta(barberia.pk)
+    else:
+        tarjetas().replace_one({'_id': barberia.pk}, tarjeta, upsert=True)
+
+
+def eliminar_tarjeta(barberia_id):
+    tarjetas().delete_one({'_id': barberia_id})
+
+
+def reconstruir(tamano_lote=500, salida=None):
+    """
+    Reconstruye todas las tarjetas: dos agregaciones para los contadores y
+    escrituras por lotes con bulk_write. Borra las tarjetas de barberías que ya no existen.
+    """
+    asegurar_indices()
+
+    comentarios = {
+        doc['_id']: doc['total']
+        for doc in coleccion(Comment).aggregate([
+            {'$group': {'_id': '$barberia_id', 'total': {'$sum': 1}}},
+        ])
+    }
+    servicios = {}
+    for doc in coleccion(Servicio).aggregate([
+        {'$sort': {'precio': ASCENDING}},
+        {'$group': {
+            '_id': '$barberia_id',
+            'total': {'$sum': 1},
+            # $sort deja los precios nulos primero: tomar el primero que no sea nulo
+            'precios': {'$push': {'$cond': [{'$ne': [{'$ifNull': ['$precio', None]}, None]}, ['$precio', '$moneda'], '$$REMOVE']}},
+        }},
+    ]):
+        precios = doc.get('precios') or []
+        servicios[doc['_id']] = (doc['total'], precios[0] if precios else None)
+
+    vistas = []
+    operaciones = []
+    total = 0
+    barberias = User.objects.filter(barberia__isnull=False, is_active=True).exclude(barberia=[]).iterator()
+    for user in barberias:
+        total_servicios, mas_barato = servicios.get(user.pk, (0, None))
+        tarjeta = construir_tarjeta(user, comentarios.get(user.pk, 0), total_servicios, mas_barato)
+        if tarjeta is None:
+            continue
+        vistas.append(user.pk)
+        operaciones.append(ReplaceOne({'_id': user.pk}, tarjeta, upsert=True))
+        if len(operaciones) >= tamano_lote:
+            tarjetas().bulk_write(operaciones, ordered=False)
+            total += len(operaciones)
+            operaciones = []
+            if salida:
+                salida(f"{total} tarjetas escritas...")
+
+    if operaciones:
+        tarjetas().bulk_write(operaciones, ordered=False)
+        total += len(operaciones)
+
+    eliminadas = tarjetas().delete_many({'_id': {'$nin': vistas}}).deleted_count
+    return total, eliminadas
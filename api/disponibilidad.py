@@ -0,0 +1,37 @@
+"""
+Disponibilidad de turnos.
+
+Los turnos libres de una barbería se leen directamente de los mapas de bits de
+ocupación (api.ocupacion): un documento chico por fecha, que se actualiza con un
+$bit atómico en cada reserva. No hay una caché aparte: en Vercel cada instancia
+tendría la suya y seguiría ofreciendo turnos ya tomados en otra.
+"""
+from datetime import timedelta
+
+from .ocupacion import ocupados_por_fecha
+
+# Nombres de los días como los guarda el horario de la barbería (weekday() -> nombre)
+DIAS_SEMANA = ('lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo')
+
+
+def fechas_laborables(dias_laborables, desde, cantidad_dias):
+    """[(dia, fecha)] de los días que trabaja la barbería entre 'desde' y los 'cantidad_dias' siguientes."""
+    dias = {dia.lower() for dia in dias_laborables}
+    fechas = []
+    for offset in range(cantidad_dias):
+        fecha = desde + timedelta(days=offset)
+        if DIAS_SEMANA[fecha.weekday()] in dias:
+            fechas.append((DIAS_SEMANA[fecha.weekday()], fecha))
+    return fechas
+
+
+def turnos_libres_por_fecha(barberia_id, fechas, max_turnos):
+    """
+    Devuelve {fecha: set de turnos libres} con una sola consulta a los mapas de
+    bits de ocupación, sin importar cuántas fechas se pidan.
+    """
+    todos_los_turnos = set(range(1, max_turnos + 1))
+    return {
+        fecha: todos_los_turnos - ocupados
+        for fecha, ocupados in ocupados_por_fecha(barberia_id, fechas).items()
+    }
@@ -0,0 +1,45 @@
+import math
+
+from .geo import punto_de_usuario, punto_de_ubicacion
+
+RADIO_TIERRA_KM = 6371
+
+
+def haversine_km(punto, coordenadas):
+    """
+    Distancias (km) desde 'punto' (lng, lat) a cada par (lng, lat) de 'coordenadas',
+    en una sola pasada. Las páginas son de 10 filas: con math alcanza y no hace
+    falta NumPy, que no entra en el límite de 15 MB de la función de Vercel.
+    """
+    lng0, lat0 = math.radians(punto[0]), math.radians(punto[1])
+    cos_lat0 = math.cos(lat0)
+
+    distancias = []
+    for lng, lat in coordenadas:
+        lng, lat = math.radians(lng), math.radians(lat)
+        a = math.sin((lat - lat0) / 2) ** 2 + cos_lat0 * math.cos(lat) * math.sin((lng - lng0) / 2) ** 2
+        distancias.append(2 * RADIO_TIERRA_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return distancias
+
+
+def distancias_por_barberia(user, barberias):
+    """
+    Devuelve {pk: distancia_km} desde la ubicación del usuario a cada barbería,
+    para pasarlo al serializador por contexto y no calcular objeto por objeto.
+    Acepta instancias de User o documentos de 'barber_cards'.
+    """
+    punto = punto_de_usuario(user) if user is not None and user.is_authenticated else None
+    if punto is None:
+        return {}
+
+    pks, coordenadas = [], []
+    for barberia in barberias:
+        if isinstance(barberia, dict):
+            pk, punto_barberia = barberia['_id'], punto_de_ubicacion(barberia.get('location'))
+        else:
+            pk, punto_barberia = barberia.pk, punto_de_usuario(barberia)
+        if punto_barberia is not None:
+            pks.append(pk)
+            coordenadas.append(punto_barberia)
+
+    return {pk: round(d, 2) for pk, d in zip(pks, haversine_km(punto, coordenadas))}
@@ -0,0 +1,270 @@
+from bson import ObjectId
+from django.core.cache import cache
+
+from . import geohash
+from .barber_cards import PROYECCION_CARD, tarjetas
+
+# Ranking "barberías cerca de mí" cacheado por celda de geohash (~1.2 km x 0.6 km)
+PRECISION_CELDA_RANKING = 6
+LIMITE_RANKING = 100  # barberías guardadas por celda (10 páginas)
+TTL_RANKING = 60 * 5
+CLAVE_RANKING = 'barberias:ranking:{celda}'
+
+
+def punto_de_usuario(user):
+    """Devuelve (lng, lat) del usuario si tiene coordenadas GeoJSON válidas, o None."""
+    return punto_de_ubicacion(getattr(user, 'ubicacion_coordenadas', None))
+
+
+def punto_de_ubicacion(ubicacion):
+    """Devuelve (lng, lat) de un valor de 'ubicacion_coordenadas', o None."""
+    if not isinstance(ubicacion, dict):
+        return None
+    coords = ubicacion.get('coordinates') or []
+    if len(coords) != 2:
+        return None
+    try:
+        return float(coords[0]), float(coords[1])
+    except (TypeError, ValueError):
+        return None
+
+
+# Campos de User que influyen en el ranking (un save() que no toca ninguno no lo cambia)
+CAMPOS_USER_RANKING = frozenset({'ubicacion_coordenadas', 'is_active', 'barberia'})
+
+
+def estado_en_ranking(ubicacion, is_active, barberia):
+    """Lo que influye en el ranking de una barbería: (ubicación, activa, rating)."""
+    perfil = barberia[0] if isinstance(barberia, list) and barberia and isinstance(barberia[0], dict) else None
+    return (
+        punto_de_ubicacion(ubicacion),
+        bool(is_active and perfil is not None),
+        perfil.get('rating') if perfil else None,
+    )
+
+
+def cambio_en_ranking(anterior, actual):
+    """
+    Borra el ranking cacheado de las celdas afectadas si cambió el estado de una
+    barbería entre 'anterior' y 'actual' (ver estado_en_ranking; anterior puede ser None).
+    """
+    if anterior == actual:
+        return
+    if not actual[1] and not (anterior and anterior[1]):
+        return  # No es (ni era) una barbería activa: no aparece en ningún ranking
+    invalidar_ranking_cercano(actual[0], anterior[0] if anterior else None)
+
+
+def invalidar_ranking_cercano(*puntos):
+    """
+    Borra el ranking cacheado de la celda de cada punto (lng, lat) y de sus 8 vecinas.
+    Se llama cuando una barbería cambia de ubicación, se activa/desactiva o cambia su rating.
+    """
+    claves = set()
+    for punto in puntos:
+        if punto is None:
+            continue
+        lng, lat = punto
+        for celda in geohash.celda_y_vecinos(lat, lng, PRECISION_CELDA_RANKING):
+            claves.add(CLAVE_RANKING.format(celda=celda))
+    if claves:
+        cache.delete_many(list(claves))
+
+
+class BarberiasPorProximidad:
+    """
+    Búsqueda de barberías ordenadas por cercanía, paginada por keyset.
+
+    Las consultas se hacen sobre la colección derivada 'barber_cards' (una tarjeta
+    por barbería activa), así que 'filtro' usa sus campos (address, rating, ...).
+
+    Cada página es una consulta acotada en MongoDB que arranca justo después de
+    la última barbería de la página anterior, así que la página 50 cuesta lo
+    mismo que la primera y nunca se carga la lista completa en memoria.
+
+    - Con radio_km: solo barberías dentro del radio (endpoint 'cercanas').
+    - Sin radio_km: primero las barberías con coordenadas por distancia ($geoNear)
+      y luego las que no tienen coordenadas, ordenadas por rating.
+    - Sin punto: todas las barberías ordenadas por rating.
+
+    Con usar_cache=True (listado general) el ranking se calcula desde el centro de
+    la celda de geohash del usuario y las primeras LIMITE_RANKING barberías se
+    guardan en la caché: los vecinos del mismo barrio comparten el resultado.
+
+    Las posiciones son dicts {'f': 'c' | 'd' | 'r', 'v': índice en la caché,
+    distancia o rating, 'id': _id}.
+
+    Con queryset=None las páginas devuelven los documentos de 'barber_cards' en
+    lugar de hidratar instancias de User (modo tarjeta del listado).
+    """
+
+    def __init__(self, queryset, punto=None, radio_km=None, filtro=None, usar_cache=False):
+        self.queryset = queryset
+        self.punto = punto
+        self.radio_km = radio_km
+        self.filtro = dict(filtro or {})
+        self.distancias = {}  # {id: distancia_km} de la página cargada
+        self.celda = None
+        if usar_cache and punto is not None and radio_km is None and filtro is None:
+            lng, lat = punto
+            self.celda = geohash.codificar(lat, lng, PRECISION_CELDA_RANKING)
+            self.punto = geohash.centro_celda(lat, lng, PRECISION_CELDA_RANKING)
+
+    @property
+    def incluye_sin_ubicacion(self):
+        return self.radio_km is None
+
+    def _filtro_con_ubicacion(self):
+        return {**self.filtro, 'location': {'$exists': True}}
+
+    def _filtro_sin_ubicacion(self):
+        return {**self.filtro, 'location': {'$exists': False}}
+
+    def _geo_near(self, limite, min_distancia=None, max_distancia=None, despues_de=None, ordenar_por_id=False):
+        """[(_id, distancia_m)] por $geoNear; sin ordenar_por_id sale en orden de distancia y en streaming."""
+        geo_near = {
+            'near': {'type': 'Point', 'coordinates': list(self.punto)},
+            'key': 'location',
+            'distanceField': 'distancia',
+            'spherical': True,
+            'query': self._filtro_con_ubicacion(),
+        }
+        if self.radio_km is not None:
+            geo_near['maxDistance'] = self.radio_km * 1000
+        if max_distancia is not None:
+            geo_near['maxDistance'] = max_distancia
+        pipeline = [{'$geoNear': geo_near}]
+        if min_distancia is not None:
+            # minDistance es inclusivo: el empate en esa distancia se pide aparte, por _id
+            geo_near['minDistance'] = min_distancia
+            if max_distancia is None:
+                pipeline.append({'$match': {'distancia': {'$gt': min_distancia}}})
+        if despues_de is not None:
+            geo_near['query'] = {**geo_near['query'], '_id': {'$gt': despues_de}}
+        if ordenar_por_id:
+            pipeline.append({'$sort': {'_id': 1}})
+        pipeline += [
+            {'$limit': limite},
+            {'$project': {'_id': 1, 'distancia': 1}},
+        ]
+        return [(doc['_id'], doc['distancia']) for doc in tarjetas().aggregate(pipeline)]
+
+    def _empatadas(self, distancia, limite, despues_de=None):
+        """Barberías exactamente a 'distancia' (las de un mismo edificio), ordenadas por _id."""
+        return self._geo_near(
+            limite, min_distancia=distancia, max_distancia=distancia,
+            despues_de=despues_de, ordenar_por_id=True,
+        )
+
+    def _por_distancia(self, posicion, limite):
+        """
+        Página en orden (distancia, _id). $geoNear va en streaming con $limit justo
+        detrás, sin ordenar todo el conjunto; como dentro de un empate de distancia
+        no ordena por _id, el empate se resuelve con una consulta chica aparte.
+        """
+        filas = []
+        desde = None
+        if posicion:
+            # Primero lo que queda del empate en la distancia de la última barbería
+            desde = posicion['v']
+            filas = self._empatadas(desde, limite, despues_de=ObjectId(posicion['id']))
+
+        restante = limite - len(filas)
+        if restante > 0:
+            siguientes = self._geo_near(restante, min_distancia=desde)
+            if len(siguientes) == restante:
+                # El corte de la página puede partir un empate: la última distancia se
+                # completa con las de menor _id de ese empate
+                ultima = siguientes[-1][1]
+                antes = [fila for fila in siguientes if fila[1] < ultima]
+                siguientes = antes + self._empatadas(ultima, restante - len(antes))
+            filas += sorted(siguientes, key=lambda fila: (fila[1], fila[0]))
+
+        resultado = []
+        for pk, distancia in filas:
+            self.distancias[pk] = round(distancia / 1000, 2)
+            resultado.append((pk, {'f': 'd', 'v': distancia, 'id': str(pk)}))
+        return resultado
+
+    def _por_rating(self, filtro, posicion, limite):
+        if posicion:
+            ultimo_id = ObjectId(posicion['id'])
+            if posicion['v'] is None:
+                # Ya estamos entre las barberías sin rating (van al final, ordenadas por _id)
+                siguiente = {'rating': None, '_id': {'$gt': ultimo_id}}
+            else:
+                siguiente = {'$or': [
+                    {'rating': {'$lt': posicion['v']}},
+                    {'rating': posicion['v'], '_id': {'$gt': ultimo_id}},
+                    {'rating': None},
+                ]}
+            filtro = {'$and': [filtro, siguiente]}
+
+        cursor = tarjetas().find(filtro, {'_id': 1, 'rating': 1}).sort(
+            [('rating', -1), ('_id', 1)]
+        ).limit(limite)
+
+        filas = []
+        for doc in cursor:
+            filas.append((doc['_id'], {'f': 'r', 'v': doc.get('rating'), 'id': str(doc['_id'])}))
+        return filas
+
+    def _ranking_de_celda(self):
+        """Lista [(id, distancia_m)] de la celda, desde la caché o calculada con $geoNear."""
+        clave = CLAVE_RANKING.format(celda=self.celda)
+        ranking = cache.get(clave)
+        if ranking is None:
+            ranking = [(pos['id'], pos['v']) for _, pos in self._por_distancia(None, LIMITE_RANKING)]
+            cache.set(clave, ranking, TTL_RANKING)
+        return ranking
+
+    def _por_ranking_en_cache(self, posicion, limite):
+        ranking = self._ranking_de_celda()
+        inicio = posicion['v'] + 1 if posicion else 0
+        filas = [
+            (ObjectId(pk), {'f': 'c', 'v': inicio + k, 'id': pk})
+            for k, (pk, _) in enumerate(ranking[inicio:inicio + limite])
+        ]
+        if len(filas) < limite:
+            if len(ranking) >= LIMITE_RANKING:
+                # La caché solo guarda el principio del ranking: seguir por keyset desde la última
+                pk, distancia = ranking[-1]
+                filas += self._por_distancia({'f': 'd', 'v': distancia, 'id': pk}, limite - len(filas))
+            if len(filas) < limite and self.incluye_sin_ubicacion:
+                filas += self._por_rating(self._filtro_sin_ubicacion(), None, limite - len(filas))
+        return filas
+
+    def pagina(self, posicion, limite):
+        """
+        Devuelve (barberías de la página, posición de la última o None si no hay más).
+        Se pide un elemento extra para saber si existe una página siguiente.
+        """
+        if posicion:
+            fase = posicion['f']
+        elif self.celda is not None:
+            fase = 'c'
+        else:
+            fase = 'd' if self.punto is not None else 'r'
+
+        if fase == 'c' and self.celda is not None:
+            filas = self._por_ranking_en_cache(posicion, limite + 1)
+        elif fase in ('c', 'd'):
+            # Un cursor de caché sin celda (el usuario ya no tiene coordenadas) vuelve a empezar
+            filas = self._por_distancia(posicion if fase == 'd' else None, limite + 1)
+            if len(filas) <= limite and self.incluye_sin_ubicacion:
+                filas += self._por_rating(self._filtro_sin_ubicacion(), None, limite + 1 - len(filas))
+        else:
+            filtro = self._filtro_sin_ubicacion() if self.punto is not None else self.filtro
+            filas = self._por_rating(filtro, posicion, limite + 1)
+
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        siguiente = filas[-1][1] if hay_mas and filas else None
+
+        # Hidratar solo las barberías de la página, respetando el orden de MongoDB
+        ids = [pk for pk, _ in filas]
+        if self.queryset is None:
+            encontradas = {doc['_id']: doc for doc in tarjetas().find({'_id': {'$in': ids}}, PROYECCION_CARD)}
+        else:
+            encontradas = self.queryset.in_bulk(ids)
+        return [encontradas[pk] for pk in ids if pk in encontradas], siguiente
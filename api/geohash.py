@@ -0,0 +1,86 @@
+"""
+Utilidades mínimas de geohash.
+
+Una celda de geohash de precisión p es una celda de una grilla regular de
+longitud/latitud (ceil(5p/2) bits para la longitud y floor(5p/2) para la
+latitud), así que MongoDB puede agrupar por los índices de la grilla con $floor
+y aquí solo se traduce cada celda a su cadena geohash.
+"""
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precisión de geohash según el nivel de zoom del mapa (0 = mundo entero)
+PRECISION_POR_ZOOM = [1, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5, 5, 5, 6, 6, 6, 7, 7, 8]
+
+
+def precision_para_zoom(zoom):
+    return PRECISION_POR_ZOOM[max(0, min(int(zoom), len(PRECISION_POR_ZOOM) - 1))]
+
+
+def _bits(precision):
+    total = 5 * precision
+    return (total + 1) // 2, total // 2  # (bits de longitud, bits de latitud)
+
+
+def tamano_celda(precision):
+    """Devuelve (ancho en grados de longitud, alto en grados de latitud) de la celda."""
+    bits_lng, bits_lat = _bits(precision)
+    return 360.0 / (1 << bits_lng), 180.0 / (1 << bits_lat)
+
+
+def max_indices(precision):
+    bits_lng, bits_lat = _bits(precision)
+    return (1 << bits_lng) - 1, (1 << bits_lat) - 1
+
+
+def indices_celda(lat, lng, precision):
+    """Índices (i, j) de la celda de la grilla que contiene el punto."""
+    ancho, alto = tamano_celda(precision)
+    max_i, max_j = max_indices(precision)
+    i = min(max(int((lng + 180) // ancho), 0), max_i)
+    j = min(max(int((lat + 90) // alto), 0), max_j)
+    return i, j
+
+
+def codificar_celda(i, j, precision):
+    """Convierte los índices de la grilla en la cadena geohash de la celda."""
+    bits_lng, bits_lat = _bits(precision)
+    valor = 0
+    for pos in range(5 * precision):
+        if pos % 2 == 0:
+            bits_lng -= 1
+            bit = (i >> bits_lng) & 1
+        else:
+            bits_lat -= 1
+            bit = (j >> bits_lat) & 1
+        valor = (valor << 1) | bit
+    return ''.join(
+        BASE32[(valor >> (5 * (precision - 1 - k))) & 31] for k in range(precision)
+    )
+
+
+def codificar(lat, lng, precision):
+    return codificar_celda(*indices_celda(lat, lng, precision), precision)
+
+
+def celda_y_vecinos(lat, lng, precision):
+    """Geohash de la celda del punto y de sus 8 vecinas (la longitud da la vuelta al mundo)."""
+    i, j = indices_celda(lat, lng, precision)
+    max_i, max_j = max_indices(precision)
+    celdas = []
+    for dj in (-1, 0, 1):
+        vj = j + dj
+        if vj < 0 or vj > max_j:
+            continue
+        for di in (-1, 0, 1):
+            celda = codificar_celda((i + di) % (max_i + 1), vj, precision)
+            if celda not in celdas:
+                celdas.append(celda)
+    return celdas
+
+
+def centro_celda(lat, lng, precision):
+    """(lng, lat) del centro de la celda que contiene el punto."""
+    ancho, alto = tamano_celda(precision)
+    i, j = indices_celda(lat, lng, precision)
+    return (i + 0.5) * ancho - 180, (j + 0.5) * alto - 90
@@ -0,0 +1,103 @@
+"""
+Limpieza de turnos vencidos.
+
+Los turnos vencidos se mueven por lotes a la colección fría 'turnos_archive'
+(comando archive_turnos o el endpoint turnos/old/<token>/), así la colección de
+turnos solo guarda las semanas actuales y próximas. El índice TTL sobre
+Turnos.expira_en queda como red de seguridad, con un margen de gracia.
+
+Todo se hace por lotes acotados de _id con una pausa entre lotes, nunca con un
+delete gigante. purge_turnos sigue disponible para borrar sin archivar.
+"""
+import time
+
+from django.utils import timezone
+from pymongo.errors import BulkWriteError
+
+from .models import Turnos
+from .mongo import coleccion
+from .ocupacion import ocupaciones
+
+ARCHIVO = 'turnos_archive'
+# Claves cortas en el archivo: {_id, b: barbería, c: cliente, f: fecha, t: turno, e: estado}
+CLAVES_ARCHIVO = {'barberia_id': 'b', 'cliente_id': 'c', 'fecha_turno': 'f', 'turno': 't', 'estado': 'e'}
+# Margen que deja el índice TTL después de 'expira_en', para que el archivado llegue antes
+DIAS_GRACIA_TTL = 30
+CLAVE_DUPLICADA = 11000
+
+
+def procesar_por_lotes(collection, filtro, accion, proyeccion=None, tamano_lote=500, pausa=0.0,
+                       max_lotes=None, salida=None):
+    """
+    Aplica 'accion(documentos)' a los documentos que cumplen 'filtro', de a 'tamano_lote'
+    por vez. 'accion' debe sacarlos del filtro (borrarlos) y devolver cuántos procesó.
+    Devuelve (procesados, quedan_pendientes).
+    """
+    procesados = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        documentos = list(collection.find(filtro, proyeccion or {'_id': 1}).limit(tamano_lote))
+        if not documentos:
+            return procesados, False
+        procesados += accion(documentos)
+        lotes += 1
+        if salida:
+            salida(f"{collection.name}: {procesados} documentos procesados...")
+        if len(documentos) < tamano_lote:
+            return procesados, False
+        if pausa:
+            time.sleep(pausa)
+    return procesados, collection.find_one(filtro, {'_id': 1}) is not None
+
+
+def borrar_por_lotes(collection, filtro, **kwargs):
+    def borrar(documentos):
+        return collection.delete_many({'_id': {'$in': [doc['_id'] for doc in documentos]}}).deleted_count
+    return procesar_por_lotes(collection, filtro, borrar, **kwargs)
+
+
+def filtro_vencidos(ahora=None):
+    return {'expira_en': {'$lte': ahora or timezone.now()}}
+
+
+def purgar_turnos(tamano_lote=500, pausa=0.0, max_lotes=None, salida=None):
+    """Borra (sin archivar) los turnos vencidos y sus mapas de ocupación. Devuelve (borrados, pendientes)."""
+    filtro = filtro_vencidos()
+    opciones = {'tamano_lote': tamano_lote, 'pausa': pausa, 'max_lotes': max_lotes, 'salida': salida}
+    borrados, pendientes = borrar_por_lotes(coleccion(Turnos), filtro, **opciones)
+    borrar_por_lotes(ocupaciones(), filtro, **opciones)
+    return borrados, pendientes
+
+
+def a_archivo(doc):
+    return {'_id': doc['_id'], **{corta: doc.get(larga) for larga, corta in CLAVES_ARCHIVO.items()}}
+
+
+def archivar_turnos(tamano_lote=500, pausa=0.0, max_lotes=None, salida=None):
+    """
+    Mueve los turnos vencidos a 'turnos_archive': insert_many del lote y luego
+    delete_many de esos mismos _id. Si se corta entre los dos pasos, el reintento
+    vuelve a insertar el lote, los _id ya archivados dan clave duplicada y se
+    ignoran, y recién entonces se borran. Devuelve (archivados, pendientes).
+    """
+    turnos = coleccion(Turnos)
+    archivo = coleccion(ARCHIVO)
+
+    def archivar(documentos):
+        try:
+            archivo.insert_many([a_archivo(doc) for doc in documentos], ordered=False)
+        except BulkWriteError as error:
+            detalles = error.details
+            if detalles.get('writeConcernErrors') or any(
+                e.get('code') != CLAVE_DUPLICADA for e in detalles.get('writeErrors', [])
+            ):
+                raise
+        return turnos.delete_many({'_id': {'$in': [doc['_id'] for doc in documentos]}}).deleted_count
+
+    archivados, pendientes = procesar_por_lotes(
+        turnos, filtro_vencidos(), archivar,
+        proyeccion={campo: 1 for campo in CLAVES_ARCHIVO},
+        tamano_lote=tamano_lote, pausa=pausa, max_lotes=max_lotes, salida=salida,
+    )
+    # Los mapas de ocupación de fechas pasadas no se archivan: solo sirven para reservar
+    borrar_por_lotes(ocupaciones(), filtro_vencidos(), tamano_lote=tamano_lote, pausa=pausa, max_lotes=max_lotes)
+    return archivados, pendientes
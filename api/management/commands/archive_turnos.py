@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.limpieza import archivar_turnos, filtro_vencidos
+from api.models import Turnos
+from api.mongo import coleccion
+
+
+class Command(BaseCommand):
+    help = "Mueve por lotes los turnos vencidos a la colección 'turnos_archive'"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Turnos archivados por lote (default: 500)',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.2,
+            help='Pausa en segundos entre lotes para no saturar el cluster (default: 0.2)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo informa cuántos turnos se archivarían',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            total = coleccion(Turnos).count_documents(filtro_vencidos())
+            self.stdout.write(self.style.SUCCESS(f"[dry-run] Se archivarían {total} turnos vencidos."))
+            return
+
+        archivados, _ = archivar_turnos(
+            tamano_lote=options['batch_size'],
+            pausa=options['sleep'],
+            salida=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Se archivaron {archivados} turnos vencidos."))
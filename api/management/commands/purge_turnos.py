@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.limpieza import filtro_vencidos, purgar_turnos
+from api.models import Turnos
+from api.mongo import coleccion
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes los turnos vencidos (los que el índice TTL todavía no borró)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Turnos borrados por lote (default: 500)',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.2,
+            help='Pausa en segundos entre lotes para no saturar el cluster (default: 0.2)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo informa cuántos turnos se borrarían',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            total = coleccion(Turnos).count_documents(filtro_vencidos())
+            self.stdout.write(self.style.SUCCESS(f"[dry-run] Se borrarían {total} turnos vencidos."))
+            return
+
+        borrados, _ = purgar_turnos(
+            tamano_lote=options['batch_size'],
+            pausa=options['sleep'],
+            salida=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Se eliminaron {borrados} turnos vencidos."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.barber_cards import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la colección derivada 'barber_cards' a partir de usuarios, comentarios y servicios"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Tarjetas por cada bulk_write (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        escritas, eliminadas = reconstruir(
+            tamano_lote=options['batch_size'],
+            salida=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Tarjetas reconstruidas: {escritas}. Tarjetas huérfanas eliminadas: {eliminadas}."
+        ))
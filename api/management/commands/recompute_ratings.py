@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ratings import recalcular_ratings
+
+
+class Command(BaseCommand):
+    help = "Recalcula el rating de todas las barberías a partir de sus comentarios"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo informa cuántas barberías cambiarían, sin escribir nada',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Actualizaciones por cada bulk_write (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        revisadas, corregidas = recalcular_ratings(
+            tamano_lote=options['batch_size'],
+            dry_run=options['dry_run'],
+            salida=self.stdout.write,
+        )
+        segundos = time.monotonic() - inicio
+
+        if options['dry_run']:
+            mensaje = f"[dry-run] {revisadas} barberías revisadas, {corregidas} se corregirían ({segundos:.1f}s)."
+        else:
+            mensaje = f"{revisadas} barberías revisadas, {corregidas} corregidas ({segundos:.1f}s)."
+        self.stdout.write(self.style.SUCCESS(mensaje))
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def invertir_coordenadas(apps, schema_editor):
+    """
+    Las coordenadas se guardaban como [lat, lng]; GeoJSON exige [lng, lat].
+    Invertir el arreglo es su propia operación inversa, así que sirve para ambos sentidos.
+    """
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.update_many(
+        {'ubicacion_coordenadas.coordinates.1': {'$exists': True}},
+        [{'$set': {
+            'ubicacion_coordenadas.coordinates': {'$reverseArray': '$ubicacion_coordenadas.coordinates'}
+        }}],
+    )
+
+
+def crear_indice_2dsphere(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.create_index([('ubicacion_coordenadas', '2dsphere')], name='ubicacion_2dsphere')
+
+
+def eliminar_indice_2dsphere(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.drop_index('ubicacion_2dsphere')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(invertir_coordenadas, invertir_coordenadas),
+        migrations.RunPython(crear_indice_2dsphere, eliminar_indice_2dsphere),
+    ]
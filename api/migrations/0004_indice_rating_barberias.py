@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def crear_indice_rating(apps, schema_editor):
+    """Índice para recorrer las barberías por rating con paginación por cursor (rating, _id)."""
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.create_index(
+        [('is_active', 1), ('barberia.0.rating', -1), ('_id', 1)],
+        name='barberias_rating_cursor',
+    )
+
+
+def eliminar_indice_rating(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.drop_index('barberias_rating_cursor')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_ubicacion_geojson_2dsphere'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_rating, eliminar_indice_rating),
+    ]
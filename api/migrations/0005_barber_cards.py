@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def crear_barber_cards(apps, schema_editor):
+    """
+    Crea los índices de 'barber_cards' y la llena por primera vez.
+    Se usa el mismo código que el comando rebuild_barber_cards.
+    """
+    from api.barber_cards import reconstruir
+    reconstruir()
+
+    # Los listados ya no ordenan por rating sobre 'api_user'
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.drop_index('barberias_rating_cursor')
+
+
+def eliminar_barber_cards(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.create_index(
+        [('is_active', 1), ('barberia.0.rating', -1), ('_id', 1)],
+        name='barberias_rating_cursor',
+    )
+    schema_editor.connection.get_collection('barber_cards').drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_indice_rating_barberias'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_barber_cards, eliminar_barber_cards),
+    ]
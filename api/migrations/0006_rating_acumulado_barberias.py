@@ -0,0 +1,55 @@
+from django.db import migrations
+from pymongo import UpdateOne
+
+
+def calcular_acumulados(apps, schema_editor):
+    """
+    Llena barberia[0].rating_sum y rating_count a partir de los comentarios existentes
+    y recalcula el promedio, en la barbería y en su tarjeta de 'barber_cards'.
+    """
+    User = apps.get_model('api', 'User')
+    Comment = apps.get_model('api', 'Comment')
+    users = schema_editor.connection.get_collection(User._meta.db_table)
+    comments = schema_editor.connection.get_collection(Comment._meta.db_table)
+    cards = schema_editor.connection.get_collection('barber_cards')
+
+    acumulados = {
+        doc['_id']: (doc['suma'], doc['cantidad'])
+        for doc in comments.aggregate([
+            {'$group': {'_id': '$barberia_id', 'suma': {'$sum': '$rating'}, 'cantidad': {'$sum': 1}}},
+        ])
+    }
+
+    operaciones, operaciones_cards = [], []
+    for doc in users.find({'barberia.0': {'$exists': True}}, {'_id': 1}):
+        suma, cantidad = acumulados.get(doc['_id'], (0, 0))
+        cambios = {'barberia.0.rating_sum': suma, 'barberia.0.rating_count': cantidad}
+        if cantidad:
+            cambios['barberia.0.rating'] = round(suma / cantidad, 2)
+            operaciones_cards.append(UpdateOne({'_id': doc['_id']}, {'$set': {'rating': cambios['barberia.0.rating']}}))
+        operaciones.append(UpdateOne({'_id': doc['_id']}, {'$set': cambios}))
+
+    if operaciones:
+        users.bulk_write(operaciones, ordered=False)
+    if operaciones_cards:
+        cards.bulk_write(operaciones_cards, ordered=False)
+
+
+def quitar_acumulados(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    users = schema_editor.connection.get_collection(User._meta.db_table)
+    users.update_many(
+        {'barberia.0': {'$exists': True}},
+        {'$unset': {'barberia.0.rating_sum': '', 'barberia.0.rating_count': ''}},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_barber_cards'),
+    ]
+
+    operations = [
+        migrations.RunPython(calcular_acumulados, quitar_acumulados),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from pymongo import UpdateOne
+
+
+def calcular_histogramas(apps, schema_editor):
+    """Llena barberia[0].rating_hist ({"1": n, ..., "5": n}) a partir de los comentarios existentes."""
+    User = apps.get_model('api', 'User')
+    Comment = apps.get_model('api', 'Comment')
+    users = schema_editor.connection.get_collection(User._meta.db_table)
+    comments = schema_editor.connection.get_collection(Comment._meta.db_table)
+
+    histogramas = {}
+    for doc in comments.aggregate([
+        {'$group': {'_id': {'barberia': '$barberia_id', 'rating': '$rating'}, 'total': {'$sum': 1}}},
+    ]):
+        hist = histogramas.setdefault(doc['_id']['barberia'], {str(n): 0 for n in range(1, 6)})
+        hist[str(doc['_id']['rating'])] = doc['total']
+
+    operaciones = [
+        UpdateOne(
+            {'_id': doc['_id']},
+            {'$set': {'barberia.0.rating_hist': histogramas.get(doc['_id'], {str(n): 0 for n in range(1, 6)})}},
+        )
+        for doc in users.find({'barberia.0': {'$exists': True}}, {'_id': 1})
+    ]
+    if operaciones:
+        users.bulk_write(operaciones, ordered=False)
+
+
+def quitar_histogramas(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    users = schema_editor.connection.get_collection(User._meta.db_table)
+    users.update_many({'barberia.0': {'$exists': True}}, {'$unset': {'barberia.0.rating_hist': ''}})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_rating_acumulado_barberias'),
+    ]
+
+    operations = [
+        migrations.RunPython(calcular_histogramas, quitar_histogramas),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_comment_barberia_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='turnos',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='turnos',
+            constraint=models.UniqueConstraint(
+                fields=['barberia', 'fecha_turno', 'turno'],
+                name='turno_unico_por_barberia_fecha',
+            ),
+        ),
+    ]
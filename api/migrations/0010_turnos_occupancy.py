@@ -0,0 +1,45 @@
+from django.db import migrations
+from pymongo import ReplaceOne
+
+
+def construir_ocupacion(apps, schema_editor):
+    """Arma el mapa de bits de ocupación de cada (barbería, fecha) a partir de los turnos existentes."""
+    from api.ocupacion import COLECCION, palabras_de_turnos
+
+    Turnos = apps.get_model('api', 'Turnos')
+    turnos = schema_editor.connection.get_collection(Turnos._meta.db_table)
+    ocupaciones = schema_editor.connection.get_collection(COLECCION)
+
+    operaciones = []
+    for doc in turnos.aggregate([
+        {'$group': {
+            '_id': {'b': '$barberia_id', 'f': '$fecha_turno'},
+            'turnos': {'$push': '$turno'},
+        }},
+    ]):
+        operaciones.append(ReplaceOne(
+            {'_id': doc['_id']},
+            {'_id': doc['_id'], **palabras_de_turnos(doc['turnos'])},
+            upsert=True,
+        ))
+        if len(operaciones) >= 1000:
+            ocupaciones.bulk_write(operaciones, ordered=False)
+            operaciones = []
+    if operaciones:
+        ocupaciones.bulk_write(operaciones, ordered=False)
+
+
+def eliminar_ocupacion(apps, schema_editor):
+    from api.ocupacion import COLECCION
+    schema_editor.connection.get_collection(COLECCION).drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_turno_unico_por_barberia_fecha'),
+    ]
+
+    operations = [
+        migrations.RunPython(construir_ocupacion, eliminar_ocupacion),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def reconstruir_ocupacion(apps, schema_editor):
+    """Los turnos cancelados dejan de ocupar lugar: se rearman los mapas de bits solo con los reservados."""
+    from api.ocupacion import reconstruir
+
+    Turnos = apps.get_model('api', 'Turnos')
+    reconstruir(schema_editor.connection.get_collection(Turnos._meta.db_table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_turnos_occupancy'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='turnos',
+            name='turno_unico_por_barberia_fecha',
+        ),
+        migrations.AddConstraint(
+            model_name='turnos',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(estado='R'),
+                fields=['barberia', 'fecha_turno', 'turno'],
+                name='turno_reservado_unico',
+            ),
+        ),
+        migrations.RunPython(reconstruir_ocupacion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+def calcular_expiracion(apps, schema_editor):
+    """
+    Llena 'expira_en' de los turnos existentes (y de los mapas de ocupación) y crea
+    los índices TTL: MongoDB borra cada documento cuando pasa su 'expira_en'.
+    """
+    from api.models import Turnos as TurnosActual
+    from api.ocupacion import COLECCION
+
+    Turnos = apps.get_model('api', 'Turnos')
+    turnos = schema_editor.connection.get_collection(Turnos._meta.db_table)
+    ocupaciones = schema_editor.connection.get_collection(COLECCION)
+    dias = TurnosActual.DIAS_HASTA_EXPIRAR
+
+    turnos.update_many({}, [{'$set': {'expira_en': {
+        '$dateAdd': {'startDate': '$fecha_turno', 'unit': 'day', 'amount': dias},
+    }}}])
+    ocupaciones.update_many({}, [{'$set': {'expira_en': {
+        '$dateAdd': {'startDate': '$_id.f', 'unit': 'day', 'amount': dias},
+    }}}])
+
+    turnos.create_index('expira_en', name='turnos_expira_ttl', expireAfterSeconds=0)
+    ocupaciones.create_index('expira_en', name='ocupacion_expira_ttl', expireAfterSeconds=0)
+
+
+def quitar_expiracion(apps, schema_editor):
+    from api.ocupacion import COLECCION
+
+    Turnos = apps.get_model('api', 'Turnos')
+    schema_editor.connection.get_collection(Turnos._meta.db_table).drop_index('turnos_expira_ttl')
+    schema_editor.connection.get_collection(COLECCION).drop_index('ocupacion_expira_ttl')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_turno_reservado_unico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='turnos',
+            name='expira_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calcular_expiracion, quitar_expiracion),
+    ]
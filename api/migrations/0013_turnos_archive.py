@@ -0,0 +1,44 @@
+from django.db import migrations
+
+DIAS_GRACIA_TTL = 30  # api.limpieza.DIAS_GRACIA_TTL al crear esta migración
+
+
+def preparar_archivo(apps, schema_editor):
+    """
+    Crea los índices de 'turnos_archive' y le da al índice TTL de turnos un margen
+    de gracia, para que los turnos vencidos se archiven antes de que MongoDB los borre.
+    """
+    Turnos = apps.get_model('api', 'Turnos')
+    connection = schema_editor.connection
+
+    archivo = connection.get_collection('turnos_archive')
+    archivo.create_index([('b', 1), ('f', -1)], name='archivo_barberia_fecha')
+    archivo.create_index([('c', 1), ('f', -1)], name='archivo_cliente_fecha')
+
+    connection.get_collection(Turnos._meta.db_table).database.command({
+        'collMod': Turnos._meta.db_table,
+        'index': {'name': 'turnos_expira_ttl', 'expireAfterSeconds': DIAS_GRACIA_TTL * 24 * 60 * 60},
+    })
+
+
+def quitar_archivo(apps, schema_editor):
+    Turnos = apps.get_model('api', 'Turnos')
+    connection = schema_editor.connection
+    connection.get_collection(Turnos._meta.db_table).database.command({
+        'collMod': Turnos._meta.db_table,
+        'index': {'name': 'turnos_expira_ttl', 'expireAfterSeconds': 0},
+    })
+    archivo = connection.get_collection('turnos_archive')
+    archivo.drop_index('archivo_barberia_fecha')
+    archivo.drop_index('archivo_cliente_fecha')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_turnos_expira_en'),
+    ]
+
+    operations = [
+        migrations.RunPython(preparar_archivo, quitar_archivo),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_turnos_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='turnos',
+            index=models.Index(fields=['cliente', 'fecha_turno', 'turno'], name='turno_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turnos',
+            index=models.Index(fields=['barberia', 'fecha_turno', 'turno'], name='turno_barberia_fecha_idx'),
+        ),
+    ]
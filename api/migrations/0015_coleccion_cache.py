@@ -0,0 +1,30 @@
+from django.db import migrations
+from pymongo import IndexModel
+
+COLECCION_CACHE = 'django_cache'  # settings.CACHES['default']['LOCATION'] al crear esta migración
+
+
+def crear_coleccion_cache(apps, schema_editor):
+    """
+    Índices que necesita el backend de caché de MongoDB (los mismos que crea
+    MongoDBCache.create_indexes): TTL sobre 'expires_at' y clave única.
+    """
+    schema_editor.connection.get_collection(COLECCION_CACHE).create_indexes([
+        IndexModel('expires_at', expireAfterSeconds=0),
+        IndexModel('key', unique=True),
+    ])
+
+
+def eliminar_coleccion_cache(apps, schema_editor):
+    schema_editor.connection.get_collection(COLECCION_CACHE).drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_turnos_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_coleccion_cache, eliminar_coleccion_cache),
+    ]
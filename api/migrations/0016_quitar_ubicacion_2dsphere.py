@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def eliminar_indice_2dsphere(apps, schema_editor):
+    """
+    Las búsquedas por cercanía leen 'barber_cards' (índice card_location_2dsphere):
+    el índice geoespacial de 'api_user' ya no lo usa ninguna consulta y solo encarece
+    cada escritura de User.
+    """
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    if 'ubicacion_2dsphere' in collection.index_information():
+        collection.drop_index('ubicacion_2dsphere')
+
+
+def crear_indice_2dsphere(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    collection = schema_editor.connection.get_collection(User._meta.db_table)
+    collection.create_index([('ubicacion_coordenadas', '2dsphere')], name='ubicacion_2dsphere')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_coleccion_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_indice_2dsphere, crear_indice_2dsphere),
+    ]
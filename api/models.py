@@ -80,6 +80,10 @@ class Comment(models.Model):
         verbose_name_plural = 'Comentarios'
         unique_together = ('barberia', 'cliente')
         ordering = ['-date']
+        indexes = [
+            # Comentarios de una barbería, del más reciente al más antiguo (paginados)
+            models.Index(fields=['barberia', '-date'], name='comment_barberia_date_idx'),
+        ]
 
     def __str__(self):
         # Primero, intenta obtener el nombre de la barbería del JSONField
@@ -117,6 +121,23 @@ class Turnos(models.Model):
         ('R', 'Reservado'),
         ('C', 'Cancelado'),
     ), default='R') # Añade 'default' aquí
+    # Momento en que el índice TTL de MongoDB borra el turno (ver calcular_expiracion)
+    expira_en = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Días que se conserva un turno después de su fecha
+    DIAS_HASTA_EXPIRAR = 1
+
+    @classmethod
+    def calcular_expiracion(cls, fecha_turno):
+        """Medianoche (UTC) del día en que el turno deja de conservarse."""
+        from datetime import time, timezone
+        return datetime.combine(fecha_turno + timedelta(days=cls.DIAS_HASTA_EXPIRAR), time(), tzinfo=timezone.utc)
+
+    def save(self, *args, **kwargs):
+        if self.fecha_turno:
+            self.expira_en = self.calcular_expiracion(self.fecha_turno)
+        super().save(*args, **kwargs)
+
     @staticmethod
     def calcular_fecha_turno(dia_seleccionado):
         """Devuelve la fecha del próximo día seleccionado, ajustando para la hora de cierre."""
@@ -144,8 +165,21 @@ class Turnos(models.Model):
     class Meta:
         verbose_name = 'Turno'
         verbose_name_plural = 'Turnos'
-        unique_together = ('barberia', 'turno', 'fecha_turno')  # Asegura que no haya duplicados
         ordering = ['fecha_turno', 'turno']
+        constraints = [
+            # Índice único parcial en MongoDB: solo los turnos reservados ocupan el lugar,
+            # así un turno cancelado se puede volver a reservar y el índice no crece con el historial
+            models.UniqueConstraint(
+                fields=['barberia', 'fecha_turno', 'turno'],
+                condition=models.Q(estado='R'),
+                name='turno_reservado_unico',
+            ),
+        ]
+        # Respaldan los listados "mis turnos" (filtro por ventana de fechas + ordering)
+        indexes = [
+            models.Index(fields=['cliente', 'fecha_turno', 'turno'], name='turno_cliente_fecha_idx'),
+            models.Index(fields=['barberia', 'fecha_turno', 'turno'], name='turno_barberia_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Turno  N° {self.turno} para el cliente {self.cliente.first_name} {self.cliente.last_name}, en la Barberia {self.barberia.username}. Estado del turno: {self.get_estado_display()}"
@@ -0,0 +1,10 @@
+from django.db import connection
+
+
+def coleccion(modelo_o_nombre):
+    """
+    Devuelve la colección de MongoDB reutilizando la conexión de Django,
+    en lugar de abrir un MongoClient nuevo en cada operación.
+    """
+    nombre = getattr(getattr(modelo_o_nombre, '_meta', None), 'db_table', modelo_o_nombre)
+    return connection.get_collection(nombre)
@@ -0,0 +1,135 @@
+"""
+Mapas de bits de ocupación de turnos.
+
+Los turnos van de 1 a 100 (validadores de Turnos.turno), así que la ocupación de
+una barbería en un día entra en dos palabras de 64 bits. Por cada (barbería, fecha)
+hay un documento en 'turnos_occupancy':
+
+    {'_id': {'b': barberia_id, 'f': fecha}, 'w0': Int64, 'w1': Int64, 'expira_en': datetime}
+
+donde el bit (turno - 1) % 64 de la palabra w[(turno - 1) // 64] indica si el
+turno está ocupado (hay un turno con estado 'R'; los cancelados no ocupan). Reservar y liberar son un $bit atómico; leer la
+disponibilidad de una semana son unos pocos documentos chicos, sin importar
+cuántos turnos haya en la colección.
+"""
+from datetime import datetime, time
+
+from bson.int64 import Int64
+from pymongo import ReplaceOne, UpdateOne
+
+from .models import Turnos
+from .mongo import coleccion
+
+COLECCION = 'turnos_occupancy'
+BITS_POR_PALABRA = 64
+PALABRAS = 2
+MASCARA_64 = (1 << BITS_POR_PALABRA) - 1
+
+
+def ocupaciones():
+    return coleccion(COLECCION)
+
+
+def _id(barberia_id, fecha):
+    # MongoDB no tiene tipo fecha sin hora: se guarda como datetime a medianoche (igual que DateField)
+    return {'b': barberia_id, 'f': datetime.combine(fecha, time())}
+
+
+def _con_signo(valor):
+    """MongoDB guarda enteros de 64 bits con signo: el bit 63 se representa como negativo."""
+    valor &= MASCARA_64
+    return Int64(valor - (1 << BITS_POR_PALABRA) if valor >> (BITS_POR_PALABRA - 1) else valor)
+
+
+def _posicion(turno):
+    indice = turno - 1
+    return f'w{indice // BITS_POR_PALABRA}', 1 << (indice % BITS_POR_PALABRA)
+
+
+def _cambio(turno, ocupado):
+    palabra, bit = _posicion(turno)
+    if ocupado:
+        return {'$bit': {palabra: {'or': _con_signo(bit)}}}
+    return {'$bit': {palabra: {'and': _con_signo(~bit)}}}
+
+
+def ocupar(barberia_id, fecha, turno):
+    cambio = _cambio(turno, True)
+    # Vence junto con los turnos de esa fecha (índice TTL sobre 'expira_en')
+    cambio['$setOnInsert'] = {'expira_en': Turnos.calcular_expiracion(fecha)}
+    ocupaciones().update_one({'_id': _id(barberia_id, fecha)}, cambio, upsert=True)
+
+
+def ocupar_varios(barberia_id, lugares):
+    """Como ocupar(), para varios (fecha, turno) de una barbería en un solo bulk_write."""
+    operaciones = []
+    for fecha, turno in lugares:
+        cambio = _cambio(turno, True)
+        cambio['$setOnInsert'] = {'expira_en': Turnos.calcular_expiracion(fecha)}
+        operaciones.append(UpdateOne({'_id': _id(barberia_id, fecha)}, cambio, upsert=True))
+    if operaciones:
+        ocupaciones().bulk_write(operaciones, ordered=False)
+
+
+def liberar(barberia_id, fecha, turno):
+    ocupaciones().update_one({'_id': _id(barberia_id, fecha)}, _cambio(turno, False))
+
+
+def palabras_de_turnos(turnos):
+    """{'w0': Int64, 'w1': Int64} con los bits de los turnos dados encendidos."""
+    palabras = [0] * PALABRAS
+    for turno in turnos:
+        indice = turno - 1
+        palabras[indice // BITS_POR_PALABRA] |= 1 << (indice % BITS_POR_PALABRA)
+    return {f'w{numero}': _con_signo(valor) for numero, valor in enumerate(palabras)}
+
+
+def turnos_de_palabras(doc):
+    """Conjunto de turnos ocupados a partir de las palabras de un documento de ocupación."""
+    turnos = set()
+    for numero in range(PALABRAS):
+        palabra = int(doc.get(f'w{numero}', 0)) & MASCARA_64
+        while palabra:
+            bit = palabra & -palabra
+            turnos.add(numero * BITS_POR_PALABRA + bit.bit_length())
+            palabra ^= bit
+    return turnos
+
+
+def ocupados_por_fecha(barberia_id, fechas):
+    """{fecha: set de turnos ocupados} leyendo un documento por fecha."""
+    ocupados = {fecha: set() for fecha in fechas}
+    ids = {_id(barberia_id, fecha)['f']: fecha for fecha in ocupados}
+    if not ids:
+        return ocupados
+    for doc in ocupaciones().find({'_id': {'$in': [_id(barberia_id, fecha) for fecha in ocupados]}}):
+        ocupados[ids[doc['_id']['f']]] = turnos_de_palabras(doc)
+    return ocupados
+
+
+def reconstruir(turnos, tamano_lote=1000):
+    """Rearma todos los mapas de bits a partir de la colección de Turnos (solo los reservados)."""
+    collection = ocupaciones()
+    collection.delete_many({})
+    operaciones = []
+    for doc in turnos.aggregate([
+        {'$match': {'estado': 'R'}},
+        {'$group': {
+            '_id': {'b': '$barberia_id', 'f': '$fecha_turno'},
+            'turnos': {'$push': '$turno'},
+        }},
+    ]):
+        operaciones.append(ReplaceOne(
+            {'_id': doc['_id']},
+            {
+                '_id': doc['_id'],
+                **palabras_de_turnos(doc['turnos']),
+                'expira_en': Turnos.calcular_expiracion(doc['_id']['f'].date()),
+            },
+            upsert=True,
+        ))
+        if len(operaciones) >= tamano_lote:
+            collection.bulk_write(operaciones, ordered=False)
+            operaciones = []
+    if operaciones:
+        collection.bulk_write(operaciones, ordered=False)
@@ -0,0 +1,89 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProximidadCursorPagination(BasePagination):
+    """
+    Paginación por cursor para listados de barberías ordenados por distancia o rating.
+
+    El cursor es un token opaco con la posición (distancia o rating, _id) de la
+    última barbería entregada; la página siguiente es una consulta por rango que
+    arranca ahí. Espera recibir una BarberiasPorProximidad (api.geo).
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        posicion = self.decodificar_cursor(request)
+        self.page, self.siguiente = queryset.pagina(posicion, self.page_size)
+        return self.page
+
+    def decodificar_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            posicion = json.loads(urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            if posicion.get('f') not in ('c', 'd', 'r'):
+                raise ValueError
+            ObjectId(posicion['id'])
+            if posicion['f'] == 'c':
+                # Índice dentro del ranking cacheado de la celda
+                posicion['v'] = int(posicion['v'])
+                if posicion['v'] < 0:
+                    raise ValueError
+            elif posicion['v'] is not None:
+                posicion['v'] = float(posicion['v'])
+        except (TypeError, ValueError, KeyError, AttributeError, InvalidId, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return posicion
+
+    def codificar_cursor(self, posicion):
+        token = urlsafe_b64encode(json.dumps(posicion, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if self.siguiente is None:
+            return None
+        return self.codificar_cursor(self.siguiente)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': 'http://api.example.org/barbers/?cursor=eyJmIjoiZCJ9',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Cursor de la página siguiente (devuelto en "next")',
+            'schema': {'type': 'string'},
+        }]
@@ -0,0 +1,141 @@
+"""
+Rating de las barberías mantenido de forma incremental.
+
+En barberia[0] se guardan 'rating_sum', 'rating_count' y el histograma de
+estrellas 'rating_hist' ({"1": n, ..., "5": n}); cada comentario creado, editado
+o borrado aplica un $inc atómico sobre ellos y el promedio ('rating') se deriva
+de la suma y la cantidad. Así un comentario nuevo no recorre todos los demás ni
+reescribe el perfil completo con User.save().
+"""
+from pymongo import ReturnDocument, UpdateOne
+
+from .barber_cards import tarjetas
+from .models import User, Comment
+from .mongo import coleccion
+
+
+ESTRELLAS = ('1', '2', '3', '4', '5')
+
+
+def promedio(suma, cantidad):
+    return round(suma / cantidad, 2) if cantidad > 0 else 0.0
+
+
+def histograma(rating_hist):
+    """Histograma completo con las cinco claves, aunque falten en el documento."""
+    rating_hist = rating_hist or {}
+    return {estrellas: rating_hist.get(estrellas, 0) for estrellas in ESTRELLAS}
+
+
+def aplicar_cambio_rating(barberia_id, antes=None, despues=None):
+    """
+    Aplica a los acumulados de la barbería el cambio de un comentario que tenía
+    'antes' estrellas y pasa a tener 'despues' (None si no existía o se borró),
+    y recalcula su rating. Devuelve el nuevo promedio, o None si la barbería no existe.
+    """
+    delta_cantidad = (despues is not None) - (antes is not None)
+    incrementos = {
+        'barberia.0.rating_sum': (despues or 0) - (antes or 0),
+        'barberia.0.rating_count': delta_cantidad,
+    }
+    if antes is not None:
+        incrementos[f'barberia.0.rating_hist.{antes}'] = -1
+    if despues is not None:
+        clave = f'barberia.0.rating_hist.{despues}'
+        incrementos[clave] = incrementos.get(clave, 0) + 1
+
+    users = coleccion(User)
+    doc = users.find_one_and_update(
+        {'_id': barberia_id, 'barberia.0': {'$exists': True}},
+        {'$inc': incrementos},
+        projection={'barberia.rating_sum': 1, 'barberia.rating_count': 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return None
+
+    perfil = doc['barberia'][0]
+    suma, cantidad = perfil.get('rating_sum', 0), perfil.get('rating_count', 0)
+    nuevo = promedio(suma, cantidad)
+
+    # Solo se fija el promedio si nadie tocó los acumulados mientras tanto;
+    # si otro comentario llegó en el medio, ese escritor fija el promedio más nuevo.
+    fijado = users.update_one(
+        {'_id': barberia_id, 'barberia.0.rating_sum': suma, 'barberia.0.rating_count': cantidad},
+        {'$set': {'barberia.0.rating': nuevo}},
+    ).matched_count
+
+    cambios = {'$inc': {'comments_count': delta_cantidad}}
+    if fijado:
+        cambios['$set'] = {'rating': nuevo}
+    tarjetas().update_one({'_id': barberia_id}, cambios)
+    # El ranking cacheado por celda solo guarda distancias, no hace falta invalidarlo
+    return nuevo
+
+
+def recalcular_ratings(tamano_lote=1000, dry_run=False, salida=None):
+    """
+    Reconciliación completa: una agregación sobre Comment calcula el histograma
+    (y de ahí la suma y la cantidad) por barbería, y solo las barberías cuyo rating guardado no coincide reciben un
+    $set (en lotes de bulk_write), junto con su tarjeta. Devuelve (revisadas, corregidas).
+    """
+    acumulados = histogramas_por_barberia()
+
+    users = coleccion(User)
+    cursor = users.find(
+        {'barberia.0': {'$exists': True}},
+        {'barberia.rating': 1, 'barberia.rating_sum': 1, 'barberia.rating_count': 1, 'barberia.rating_hist': 1},
+    )
+
+    operaciones, operaciones_cards = [], []
+    revisadas = corregidas = 0
+
+    def escribir():
+        if not dry_run and operaciones:
+            users.bulk_write(operaciones, ordered=False)
+            tarjetas().bulk_write(operaciones_cards, ordered=False)
+        operaciones.clear()
+        operaciones_cards.clear()
+
+    for doc in cursor:
+        revisadas += 1
+        perfil = doc['barberia'][0] if isinstance(doc['barberia'][0], dict) else {}
+        hist = acumulados.get(doc['_id'], histograma(None))
+        suma = sum(int(estrellas) * n for estrellas, n in hist.items())
+        cantidad = sum(hist.values())
+        esperado = {
+            'rating_sum': suma, 'rating_count': cantidad, 'rating_hist': hist,
+            'rating': promedio(suma, cantidad),
+        }
+        if cantidad == 0 and perfil.get('rating') is None:
+            esperado['rating'] = None  # Nunca tuvo comentarios: se deja sin rating
+
+        if any(perfil.get(campo) != valor for campo, valor in esperado.items()):
+            corregidas += 1
+            operaciones.append(UpdateOne(
+                {'_id': doc['_id']},
+                {'$set': {f'barberia.0.{campo}': valor for campo, valor in esperado.items()}},
+            ))
+            operaciones_cards.append(UpdateOne(
+                {'_id': doc['_id']},
+                {'$set': {'rating': esperado['rating'], 'comments_count': cantidad}},
+            ))
+            if len(operaciones) >= tamano_lote:
+                escribir()
+
+        if salida and revisadas % tamano_lote == 0:
+            salida(f"{revisadas} barberías revisadas, {corregidas} con diferencias...")
+
+    escribir()
+    return revisadas, corregidas
+
+
+def histogramas_por_barberia():
+    """{barberia_id: {"1": n, ..., "5": n}} de todas las barberías con comentarios, en una agregación."""
+    histogramas = {}
+    for doc in coleccion(Comment).aggregate([
+        {'$group': {'_id': {'barberia': '$barberia_id', 'rating': '$rating'}, 'total': {'$sum': 1}}},
+    ]):
+        hist = histogramas.setdefault(doc['_id']['barberia'], histograma(None))
+        hist[str(doc['_id']['rating'])] = doc['total']
+    return histogramas
@@ -0,0 +1,76 @@
+"""
+Reserva de varios turnos en un solo pedido (turnos/bulk/).
+
+La barbería se carga una vez, los pedidos se validan contra ese perfil, los
+lugares ya ocupados se descartan leyendo los mapas de bits de ocupación y el
+resto se inserta con un único insert_many. Como el insert va directo a
+MongoDB (sin Turnos.save() ni señales), aquí se fijan 'estado' y 'expira_en'
+y se actualizan a mano los mapas de bits de ocupación.
+"""
+from datetime import datetime, time
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from .models import Turnos
+from .mongo import coleccion
+from .ocupacion import ocupados_por_fecha, ocupar_varios
+
+CLAVE_DUPLICADA = 11000
+
+RESERVADO = 'reservado'
+OCUPADO = 'ocupado'
+INVALIDO = 'invalido'
+
+
+def reservar_turnos(barberia, cliente, pedidos):
+    """
+    'pedidos' es una lista de dicts {'dia', 'turno', 'fecha_turno'} ya validados.
+    Completa cada uno con su resultado ('estado' y, si se reservó, 'id') y devuelve
+    la cantidad de turnos reservados.
+    """
+    ocupados = ocupados_por_fecha(barberia.pk, {pedido['fecha_turno'] for pedido in pedidos})
+
+    documentos = []
+    for pedido in pedidos:
+        if pedido['turno'] in ocupados[pedido['fecha_turno']]:
+            pedido['estado'] = OCUPADO
+            continue
+        ocupados[pedido['fecha_turno']].add(pedido['turno'])  # El mismo lugar repetido en el pedido
+        pedido['_id'] = ObjectId()
+        documentos.append({
+            '_id': pedido['_id'],
+            'barberia_id': barberia.pk,
+            'cliente_id': cliente.pk,
+            'turno': pedido['turno'],
+            # DateField se guarda como datetime a medianoche
+            'fecha_turno': datetime.combine(pedido['fecha_turno'], time()),
+            'estado': 'R',
+            'expira_en': Turnos.calcular_expiracion(pedido['fecha_turno']),
+        })
+
+    rechazados = set()
+    if documentos:
+        try:
+            coleccion(Turnos).insert_many(documentos, ordered=False)
+        except BulkWriteError as error:
+            # Otro cliente reservó el mismo lugar entre la lectura y el insert
+            errores = error.details.get('writeErrors', [])
+            if error.details.get('writeConcernErrors') or any(e.get('code') != CLAVE_DUPLICADA for e in errores):
+                raise
+            rechazados = {documentos[e['index']]['_id'] for e in errores}
+
+    reservados = []
+    for pedido in pedidos:
+        _id = pedido.pop('_id', None)
+        if _id is None:
+            continue
+        if _id in rechazados:
+            pedido['estado'] = OCUPADO
+        else:
+            pedido['estado'] = RESERVADO
+            pedido['id'] = str(_id)
+            reservados.append((pedido['fecha_turno'], pedido['turno']))
+
+    ocupar_varios(barberia.pk, reservados)
+    return len(reservados)
@@ -2,9 +2,11 @@ import cloudinary
 from rest_framework import serializers
 from .models import *
 from datetime import datetime, time
+from functools import lru_cache
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
-from django.db.models import Avg 
+from django.db import IntegrityError
+from pymongo.errors import DuplicateKeyError
 User = get_user_model() # Obtén el modelo de usuario actual
 from rest_framework import serializers
 from django.core.validators import MinLengthValidator
@@ -17,6 +19,10 @@ import phonenumbers
 from phonenumbers.phonenumberutil import NumberParseException
 
 from decouple import config
+from .distancias import distancias_por_barberia
+from .ratings import promedio
+from .mongo import coleccion
+from .geo import cambio_en_ranking, estado_en_ranking
 # Diccionario para mapear nombres de días a números de semana de Python (lunes=0, domingo=6)
 DAYS_OF_WEEK_MAP = {
     'lunes': 0,
@@ -31,19 +37,30 @@ DAYS_OF_WEEK_MAP = {
 #####################VALIDAR COORDENADAS
 
 class CoordenadasField(serializers.JSONField):
+    """
+    La API recibe y devuelve [lat, lng], pero en MongoDB se guarda como GeoJSON
+    real ([lng, lat]), el mismo formato que copia la tarjeta de 'barber_cards' para $geoNear.
+    """
     def to_internal_value(self, data):
         # Validar formato de coordenadas
         if isinstance(data, dict) and data.get('type') == 'Point':
             coordinates = data.get('coordinates', [])
             if len(coordinates) == 2:
                 lat, lng = coordinates
-                if -90 <= lat <= 90 and -180 <= lng <= 180:
-                    return data
+                if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+                    if -90 <= lat <= 90 and -180 <= lng <= 180:
+                        return {'type': 'Point', 'coordinates': [lng, lat]}
         
         raise serializers.ValidationError(
             'Formato de coordenadas inválido. Use: {"type": "Point", "coordinates": [lat, lng]}'
         )
 
+    def to_representation(self, value):
+        if isinstance(value, dict) and len(value.get('coordinates') or []) == 2:
+            lng, lat = value['coordinates']
+            return {'type': value.get('type', 'Point'), 'coordinates': [lat, lng]}
+        return value
+
 ###############################################AUTH
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -372,7 +389,7 @@ class BarberiaProfileSerializer(serializers.Serializer):
     horario = HorarioSerializer(many=True, required=True)
     openingTime = TimeFieldToString(required=True)
     closingTime = TimeFieldToString(required=True)
-    rating = serializers.SerializerMethodField(read_only=True)
+    # 'rating' lo agrega BarberiaSerializer.to_representation: este perfil no conoce el id de su barbería
 
     def validate(self, data):
         # Obtener los valores existentes si estamos en una actualización
@@ -427,35 +444,6 @@ class BarberiaProfileSerializer(serializers.Serializer):
             raise serializers.ValidationError("Debe especificar el número máximo de turnos.")
         
         return value
-
-    def get_rating(self, obj):
-        # obj en este punto es el diccionario del perfil de barbería, no la instancia de User
-        # Necesitamos el ID del usuario (la barbería) para buscar los comentarios.
-        # Esto requerirá pasar el ID del usuario desde BarberiaSerializer.
-        
-        # Una forma más robusta es pasar el user_id al contexto del BarberiaProfileSerializer
-        # O calcularlo en BarberiaSerializer y luego pasarlo al to_representation.
-        # Por ahora, asumamos que obj es el objeto de User, no solo el dict de barberia.
-        # Si obj es el dict, necesitarás el ID del usuario.
-        
-        # Si 'obj' es una instancia de User (como cuando es llamado desde BarberiaSerializer.to_representation)
-        if isinstance(obj, User):
-            barberia_user_id = obj.id
-        # Si 'obj' es el diccionario 'barberia' del JSONField, y necesitas el ID del User padre
-        else: # Esto es más probable si se llama desde dentro de BarberiaSerializer.to_representation
-            # Accede al ID de la instancia de User que contiene este perfil de barbería
-            # Esto asume que BarberiaSerializer pasa 'instance' a este serializador, lo cual es estándar.
-            barberia_user_id = self.context.get('user_id_for_rating') # Necesitamos pasar este en el context
-            if not barberia_user_id:
-                return None # O lanzar un error si es un dato esencial
-
-        # Busca los comentarios en la nueva colección Comment
-        comments = Comment.objects.filter(barberia_id=barberia_user_id)
-        if not comments.exists():
-            return None
-        
-        total_rating = sum(c.rating for c in comments)
-        return round(total_rating / comments.count(), 1)
     
     def validate_phone(self, value):
         """
@@ -512,6 +500,13 @@ class ConvertToBarberiaSerializer(serializers.Serializer):
         
         return user
     
+# Campos de User que guarda BarberiaSerializer.update: todos menos el perfil 'barberia'
+CAMPOS_USER_SIN_PERFIL = [
+    field.name for field in User._meta.concrete_fields
+    if not field.primary_key and field.name != 'barberia'
+]
+
+
 class BarberiaSerializer(serializers.ModelSerializer):
     barberia = BarberiaProfileSerializer(many=True, required=True)
     id = serializers.SerializerMethodField()
@@ -533,58 +528,32 @@ class BarberiaSerializer(serializers.ModelSerializer):
         }
 
     def get_distancia_km(self, obj):
-        """Calcula y devuelve la distancia desde el usuario autenticado"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            user = request.user
-            if (hasattr(user, 'ubicacion_coordenadas') and user.ubicacion_coordenadas and
-                hasattr(obj, 'ubicacion_coordenadas') and obj.ubicacion_coordenadas):
-                
-                try:
-                    user_coords = user.ubicacion_coordenadas.get('coordinates', [])
-                    barberia_coords = obj.ubicacion_coordenadas.get('coordinates', [])
-                    
-                    if len(user_coords) == 2 and len(barberia_coords) == 2:
-                        user_lng, user_lat = user_coords
-                        barberia_lng, barberia_lat = barberia_coords
-                        
-                        # Calcular distancia
-                        from math import radians, sin, cos, sqrt, atan2
-                        R = 6371
-                        lat1_rad, lng1_rad = radians(user_lat), radians(user_lng)
-                        lat2_rad, lng2_rad = radians(barberia_lat), radians(barberia_lng)
-                        dlng, dlat = lng2_rad - lng1_rad, lat2_rad - lat1_rad
-                        a = sin(dlat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlng/2)**2
-                        distancia = R * (2 * atan2(sqrt(a), sqrt(1-a)))
-                        
-                        return round(distancia, 2)
-                        
-                except (ValueError, TypeError):
-                    pass
-        
-        return None
+        """Devuelve la distancia desde el usuario autenticado"""
+        # La vista calcula las distancias de toda la página de una sola vez y las pasa por contexto
+        distancias = self.context.get('distancias_km')
+        if distancias is None:
+            request = self.context.get('request')
+            distancias = distancias_por_barberia(request.user if request else None, [obj])
+        return distancias.get(obj.pk)
 
     def get_id(self, obj):
         return str(obj.pk) if obj.pk else None
+
+    def get_rating(self, obj):
+        # Se deriva de los acumulados que ya trae el perfil (api.ratings): sin consultas
+        # extra y con el mismo redondeo que las tarjetas, el resumen y el ranking
+        perfil = obj.barberia[0] if obj.barberia else {}
+        cantidad = perfil.get('rating_count') or 0
+        return promedio(perfil.get('rating_sum') or 0, cantidad) if cantidad else None
     
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         
-        request = self.context.get('request', None)
-        
-        # Pasa el user_id al contexto del BarberiaProfileSerializer para el cálculo del rating
+        # El perfil se expone como objeto (no lista) y con el rating de la barbería
         if 'barberia' in rep and rep['barberia']:
-            # Pasa el ID del usuario actual para que BarberiaProfileSerializer pueda calcular el rating
-            # 'instance' es la instancia de User, por lo tanto instance.id es el _id del usuario/barbería
-            profile_serializer = self.fields['barberia']
-            # Asegurarse de que el contexto se propague correctamente a los serializadores anidados
-            profile_serializer.context['user_id_for_rating'] = str(instance.id)
-            
-            # Re-serializar el perfil para que el get_rating se active con el contexto
-            rep['barberia'] = BarberiaProfileSerializer(
-                instance.barberia[0] if instance.barberia else {},
-                context={'user_id_for_rating': str(instance.id)}
-            ).data
+            perfil = rep['barberia'][0]
+            perfil['rating'] = self.get_rating(instance)
+            rep['barberia'] = perfil
 
         return {key: value for key, value in rep.items() if value is not None}
     
@@ -839,6 +808,10 @@ class BarberiaSerializer(serializers.ModelSerializer):
         
             
             barberia_data_from_request = validated_data.pop('barberia', None)
+            perfil_actualizado = None
+            # Estado en el ranking antes de escribir: el pre_save de User leería el
+            # perfil ya cambiado por el $set de abajo
+            ranking_anterior = estado_en_ranking(instance.ubicacion_coordenadas, instance.is_active, instance.barberia)
             
             if barberia_data_from_request is not None:
                 # Obtener el perfil existente o crear uno nuevo
@@ -858,24 +831,41 @@ class BarberiaSerializer(serializers.ModelSerializer):
                     if time_field in merged_data and isinstance(merged_data[time_field], time):
                         merged_data[time_field] = merged_data[time_field].strftime('%H:%M')
                 
-                # Mantener campos protegidos
-                protected_fields = ['rating', 'comments']
+                # Campos protegidos: no se escriben. Los acumulados del rating los mantiene
+                # un $inc atómico (api.ratings); copiarlos de la instancia cargada al principio
+                # pisaría los comentarios que lleguen mientras tanto.
+                protected_fields = ['rating', 'rating_sum', 'rating_count', 'rating_hist', 'comments']
                 for field in protected_fields:
-                    if field in existing_barberia:
-                        merged_data[field] = existing_barberia[field]
+                    merged_data.pop(field, None)
     
 
                 # *** CONVERTIR OBJETOS time A STRING ANTES DE GUARDAR ***
                 self._convert_time_to_string(merged_data)
-                
-                # Asignar los datos fusionados
-                instance.barberia = [merged_data]
+                perfil_actualizado = merged_data
         
             # Actualizar otros campos
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
-    
-            instance.save()
+
+            if perfil_actualizado is not None:
+                users = coleccion(User)
+                if instance.barberia:
+                    # $set solo de los campos del perfil, sin reescribir el documento 'barberia'
+                    users.update_one(
+                        {'_id': instance.pk},
+                        {'$set': {f'barberia.0.{campo}': valor for campo, valor in perfil_actualizado.items()}},
+                    )
+                else:
+                    users.update_one({'_id': instance.pk}, {'$set': {'barberia': [perfil_actualizado]}})
+                # Perfil recién escrito (con los acumulados actuales) para la respuesta y las señales
+                instance.barberia = User.objects.filter(pk=instance.pk).values_list('barberia', flat=True).first()
+
+            # 'barberia' nunca va en el save(): se escribe arriba con $set
+            instance.save(update_fields=CAMPOS_USER_SIN_PERFIL)
+            cambio_en_ranking(
+                ranking_anterior,
+                estado_en_ranking(instance.ubicacion_coordenadas, instance.is_active, instance.barberia),
+            )
             return instance
         
         except Exception as e:
@@ -971,6 +961,51 @@ class BarberiaSerializer(serializers.ModelSerializer):
     
 
 
+class BarberiaCardSerializer(serializers.Serializer):
+    """
+    Tarjeta liviana para listados (?view=card): solo lo que muestra la tarjeta.
+    Se arma desde los documentos de la colección derivada 'barber_cards' (api.barber_cards),
+    sin cargar el User completo. El perfil completo sigue disponible en el detalle (retrieve).
+    """
+    id = serializers.SerializerMethodField()
+    username = serializers.CharField(read_only=True)
+    profile_imagen = serializers.SerializerMethodField()
+    ubicacion_coordenadas = serializers.SerializerMethodField()
+    distancia_km = serializers.SerializerMethodField()
+    name_barber = serializers.CharField(source='name', read_only=True)
+    address = serializers.CharField(read_only=True)
+    rating = serializers.FloatField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    services_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.FloatField(read_only=True)
+    min_price_currency = serializers.CharField(read_only=True)
+    working_days = serializers.ListField(child=serializers.CharField(), read_only=True)
+
+    def get_id(self, obj):
+        return str(obj['_id'])
+
+    def get_profile_imagen(self, obj):
+        nombre = obj.get('profile_imagen')
+        if not nombre:
+            return None
+        return User._meta.get_field('profile_imagen').storage.url(nombre)
+
+    def get_ubicacion_coordenadas(self, obj):
+        ubicacion = obj.get('location')
+        if not ubicacion:
+            return None
+        # Se guarda como GeoJSON [lng, lat]; la API expone [lat, lng]
+        lng, lat = ubicacion['coordinates']
+        return {'type': 'Point', 'coordinates': [lat, lng]}
+
+    def get_distancia_km(self, obj):
+        return self.context.get('distancias_km', {}).get(obj['_id'])
+
+    def to_representation(self, instance):
+        rep = super().to_representation(instance)
+        return {key: value for key, value in rep.items() if value is not None}
+
+
 #####################################################3Ubicacion coordenadas
 
 class LocationField(serializers.JSONField):
@@ -987,7 +1022,7 @@ class BarberiaCercanaSerializer(BarberiaSerializer):
     distancia = serializers.SerializerMethodField()
     
     class Meta(BarberiaSerializer.Meta):
-        fields = BarberiaSerializer.Meta.fields + ['distancia', 'city', 'address']
+        fields = BarberiaSerializer.Meta.fields + ['distancia']
     
     def get_distancia(self, obj):
         # Obtener la distancia del contexto
@@ -1024,9 +1059,11 @@ class CommentSerializer(serializers.ModelSerializer):
 
     def get_cliente(self, obj):
         # Retorna la información del usuario que hizo el comentario
+        # (la vista puede pasar los clientes de la página ya cargados en un solo query)
+        cliente = self.context.get('clientes', {}).get(obj.cliente_id) or obj.cliente
         user_data = {
-            'id': str(obj.cliente.id), # ID del usuario que comentó
-            'username': obj.cliente.username, # Nombre del usuario que comentó
+            'id': str(cliente.id), # ID del usuario que comentó
+            'username': cliente.username, # Nombre del usuario que comentó
             # 'img_profile': obj.cliente.img_profile # Si tu User model tiene esto
         }
         
@@ -1040,9 +1077,10 @@ class CommentSerializer(serializers.ModelSerializer):
         return user_data
     
     def get_barberia(self, obj):
-        if obj.barberia and obj.barberia.barberia:
-            if obj.barberia.barberia and len(obj.barberia.barberia) > 0:
-                return {'nombre': obj.barberia.barberia[0].get('name_barber')}
+        barberia = self.context.get('barberias', {}).get(obj.barberia_id) or obj.barberia
+        if barberia and barberia.barberia:
+            if barberia.barberia and len(barberia.barberia) > 0:
+                return {'nombre': barberia.barberia[0].get('name_barber')}
         return None 
 
     def create(self, validated_data):
@@ -1062,7 +1100,6 @@ class CommentSerializer(serializers.ModelSerializer):
             cliente=cliente,
             **validated_data
         )
-        self.update_barber_rating(barberia_instance) 
 
         return comment
 
@@ -1072,45 +1109,13 @@ class CommentSerializer(serializers.ModelSerializer):
         if 'cliente' in validated_data:
             raise serializers.ValidationError({"cliente": "No se puede cambiar el cliente de un comentario existente."})
 
-        old_rating = instance.rating
-        
+        # El rating de la barbería se ajusta con $inc desde las señales (api.ratings)
         instance.rating = validated_data.get('rating', instance.rating)
         instance.description = validated_data.get('description', instance.description)
         instance.save()
 
-        if old_rating != instance.rating:
-            self.update_barber_rating(instance.barberia)
-
         return instance
     
-    # Nuevo método para actualizar el rating de la barbería
-    def update_barber_rating(self, barberia_instance):
-        average_rating = Comment.objects.filter(barberia=barberia_instance).aggregate(Avg('rating'))['rating__avg']
-        
-        if average_rating is None:
-            average_rating = 0.0
-        else:
-            average_rating = round(average_rating, 2)
-        
-
-        # Obtener la lista actual de barberia
-        barberia_list = barberia_instance.barberia if barberia_instance.barberia else []
-        
-        if barberia_list:  # Si hay al menos un elemento
-            # Crear una copia del primer diccionario para modificarlo
-            updated_barberia = dict(barberia_list[0])
-            updated_barberia['rating'] = average_rating
-            
-            # Reemplazar el primer elemento con la versión actualizada
-            barberia_list[0] = updated_barberia
-        else:
-            # Si no hay datos de barbería, crear una nueva entrada
-            barberia_list.append({'rating': average_rating})
-        
-        # Actualizar el campo barberia en la instancia
-        barberia_instance.barberia = barberia_list
-        barberia_instance.save()
-
     def validate(self, data):
         
         # Campos que están explícitamente definidos en este serializador y son para entrada
@@ -1159,14 +1164,6 @@ class TurnoUpdateSerializer(serializers.ModelSerializer):
             except KeyError:
                 raise ValidationError({"dia": "El día seleccionado no es válido."})
 
-            # Validar si ya se ha tomado ese turno en la nueva fecha
-            if Turnos.objects.filter(
-                barberia=barberia_instance, 
-                fecha_turno=fecha_turno_calculada, 
-                turno=turno_solicitado
-            ).exclude(id=instance.id).exists(): # 💡 Importante: Excluir el turno actual para evitar falsos positivos
-                raise ValidationError({"turno": "Este turno ya está reservado para la fecha seleccionada."})
-
             # Validar la hora de cierre si el turno es para hoy (con la nueva fecha)
             if fecha_turno_calculada == datetime.now().date():
                 hora_cierre_str = barberia_instance.barberia[0]['closingTime']
@@ -1181,8 +1178,16 @@ class TurnoUpdateSerializer(serializers.ModelSerializer):
         # `turno` y `dia` se actualizan automáticamente si están en `validated_data`
         # pero es buena práctica hacerlo de forma explícita si hay lógica compleja.
         instance.turno = turno_solicitado
+
+        # Cancelar ('C') libera el lugar; volver a 'R' solo es posible si sigue libre
+        if 'estado' in validated_data:
+            instance.estado = validated_data['estado']
         
-        instance.save()
+        # Si el turno ya está tomado en esa fecha lo rechaza el índice único
+        try:
+            instance.save()
+        except (IntegrityError, DuplicateKeyError):
+            raise ValidationError({"turno": "Este turno ya está reservado para la fecha seleccionada."})
         return instance
     
     def validate(self, data):
@@ -1202,9 +1207,12 @@ class TurnoUpdateSerializer(serializers.ModelSerializer):
             )
         return data
 
-def calcular_hora_turno(opening_time_str, closing_time_str, max_turnos, turno_num):
+@lru_cache(maxsize=1024)
+def compilar_horario(opening_time_str, closing_time_str, max_turnos):
     """
-    Devuelve el rango horario (inicio, fin) del turno solicitado.
+    Devuelve la tabla de turnos de un horario: una tupla con el rango (inicio, fin)
+    de cada turno, donde el turno N está en la posición N - 1.
+    Se calcula una sola vez por (apertura, cierre, turnos_max) y queda memoizada.
     """
     opening_time = datetime.strptime(opening_time_str, "%H:%M")
     closing_time = datetime.strptime(closing_time_str, "%H:%M")
@@ -1217,13 +1225,53 @@ def calcular_hora_turno(opening_time_str, closing_time_str, max_turnos, turno_nu
     total_minutes = (closing_time - opening_time).total_seconds() / 60
     duracion_turno = total_minutes / max_turnos
 
-    # Calcular hora de inicio del turno
-    turno_inicio = opening_time + timedelta(minutes=(turno_num - 1) * duracion_turno)
-    turno_fin = turno_inicio + timedelta(minutes=duracion_turno)
+    tabla = []
+    for indice in range(max_turnos):
+        turno_inicio = opening_time + timedelta(minutes=indice * duracion_turno)
+        turno_fin = turno_inicio + timedelta(minutes=duracion_turno)
+        # Formatear para mostrar solo hora y minuto
+        tabla.append((turno_inicio.time().strftime("%H:%M"), turno_fin.time().strftime("%H:%M")))
+    return tuple(tabla)
 
-    # Formatear para mostrar solo hora y minuto
-    return turno_inicio.time().strftime("%H:%M"), turno_fin.time().strftime("%H:%M")
+
+def calcular_hora_turno(opening_time_str, closing_time_str, max_turnos, turno_num):
+    """
+    Devuelve el rango horario (inicio, fin) del turno solicitado.
+    """
+    if turno_num < 1:
+        raise IndexError("El turno debe ser mayor o igual a 1.")
+    return compilar_horario(opening_time_str, closing_time_str, max_turnos)[turno_num - 1]
     
+def validar_pedido_turno(barberia_data, dia_seleccionado, turno_solicitado):
+    """
+    Valida un pedido (día, turno) contra el perfil de la barbería ya cargado
+    y devuelve la fecha del turno. Lanza ValidationError si no se puede reservar.
+    """
+    # 1. Validar si la barbería trabaja el día seleccionado
+    dias_laborables = [d.lower() for d in barberia_data['horario'][0]['days']]
+    if dia_seleccionado.lower() not in dias_laborables:
+        raise serializers.ValidationError({"dia": "La barbería no trabaja el día seleccionado."})
+
+    # 2. Calcular la fecha_turno
+    try:
+        fecha_turno_calculada = Turnos.calcular_fecha_turno(dia_seleccionado.lower())
+    except (KeyError, ValueError):
+        raise serializers.ValidationError({"dia": "El día seleccionado no es válido."})
+
+    # 3. Validar si el turno solicitado excede el máximo
+    max_turnos = barberia_data['horario'][0]['turnos_max']
+    if turno_solicitado > max_turnos:
+        raise serializers.ValidationError({"turno": f"El turno solicitado excede el máximo permitido ({max_turnos})."})
+
+    # 4. Validar la hora de cierre si el turno es para hoy
+    if fecha_turno_calculada == datetime.now().date():
+        hora_cierre = datetime.strptime(barberia_data['closingTime'], '%H:%M').time()
+        if datetime.now().time() > hora_cierre:
+            raise serializers.ValidationError({"dia": "El horario de cierre para hoy ha pasado. El turno se reservará para la próxima semana."})
+
+    return fecha_turno_calculada
+
+
 class TurnoSerializer(serializers.ModelSerializer):
     id = serializers.SerializerMethodField(read_only=True) 
     cliente = serializers.SerializerMethodField(read_only=True)  # Para mostrar info del cliente que comentó
@@ -1303,42 +1351,23 @@ class TurnoSerializer(serializers.ModelSerializer):
         dia_seleccionado = validated_data.pop('dia')
         turno_solicitado = validated_data.get('turno')
 
-        # 1. Validar si la barbería trabaja el día seleccionado
-        dias_laborables = [d.lower() for d in barberia_instance.barberia[0]['horario'][0]['days']]
-        if dia_seleccionado.lower() not in dias_laborables:
-            raise serializers.ValidationError({"dia": "La barbería no trabaja el día seleccionado."})
+        # 1-4. Día laborable, fecha, máximo de turnos y hora de cierre
+        fecha_turno_calculada = validar_pedido_turno(
+            barberia_instance.barberia[0], dia_seleccionado, turno_solicitado
+        )
 
-        # 2. Calcular la fecha_turno
+        # 5. Reservar con un solo insert: si el turno ya está tomado lo rechaza el índice único
         try:
-            fecha_turno_calculada = Turnos.calcular_fecha_turno(dia_seleccionado.lower())
-        except KeyError:
-            raise serializers.ValidationError({"dia": "El día seleccionado no es válido."})
-        
-        # 3. Validar si el turno solicitado excede el máximo
-        max_turnos = barberia_instance.barberia[0]['horario'][0]['turnos_max']
-        if turno_solicitado > max_turnos:
-            raise serializers.ValidationError({"turno": f"El turno solicitado excede el máximo permitido ({max_turnos})."})
-
-        # 4. Validar si ya se ha tomado ese turno en esa fecha
-        if Turnos.objects.filter(barberia=barberia_instance, fecha_turno=fecha_turno_calculada, turno=turno_solicitado).exists():
+            turno = Turnos.objects.create(
+                barberia=barberia_instance,
+                cliente=cliente,
+                fecha_turno=fecha_turno_calculada,
+                estado='R', # 'R' se puede establecer aquí o en el modelo.
+                **validated_data
+            )
+        except (IntegrityError, DuplicateKeyError):
             raise serializers.ValidationError({"turno": "Este turno ya está reservado para la fecha seleccionada."})
 
-        # 5. Validar la hora de cierre si el turno es para hoy
-        if fecha_turno_calculada == datetime.now().date():
-            hora_cierre_str = barberia_instance.barberia[0]['closingTime']
-            hora_cierre = datetime.strptime(hora_cierre_str, '%H:%M').time()
-            if datetime.now().time() > hora_cierre:
-                raise serializers.ValidationError({"dia": "El horario de cierre para hoy ha pasado. El turno se reservará para la próxima semana."})
-
-
-        turno = Turnos.objects.create(
-            barberia=barberia_instance,
-            cliente=cliente,
-            fecha_turno=fecha_turno_calculada,
-            estado='R', # 'R' se puede establecer aquí o en el modelo.
-            **validated_data
-        )
-
         return turno
 
 
@@ -1368,6 +1397,30 @@ class TurnoSerializer(serializers.ModelSerializer):
             )
         return data
 
+class TurnoPedidoSerializer(serializers.Serializer):
+    dia = serializers.CharField()
+    turno = serializers.IntegerField(min_value=1, max_value=100)
+
+
+class TurnoBulkSerializer(serializers.Serializer):
+    """Entrada de turnos/bulk/: una barbería y la lista de pares (dia, turno) a reservar."""
+    MAX_TURNOS = 10
+
+    barberia_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(barberia__isnull=False),
+    )
+    turnos = TurnoPedidoSerializer(many=True, allow_empty=False)
+
+    def validate_turnos(self, value):
+        if len(value) > self.MAX_TURNOS:
+            raise serializers.ValidationError(f"Se pueden reservar hasta {self.MAX_TURNOS} turnos por pedido.")
+        return value
+
+    def validate(self, data):
+        if self.context['request'].user.barberia is not None:
+            raise serializers.ValidationError({"detail": "Las barberías no pueden solicitar turnos."})
+        return data
+
 ###########################################Servicio
 
 
@@ -5,7 +5,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from cloudinary.uploader import destroy
 import os 
@@ -16,6 +16,13 @@ from urllib.parse import urlparse # Importa la librería
 from django.conf import settings
 import cloudinary
 
+from .geo import CAMPOS_USER_RANKING, cambio_en_ranking, estado_en_ranking, invalidar_ranking_cercano
+from .barber_cards import (
+    CAMPOS_USER_TARJETA, actualizar_tarjeta, datos_de_usuario, eliminar_tarjeta, tarjeta_al_dia,
+)
+from .ratings import aplicar_cambio_rating
+from .ocupacion import ocupar, liberar
+
 
 @receiver(pre_save, sender=User)
 def update_username_in_comments(sender, instance, **kwargs):
@@ -169,4 +176,144 @@ def delete_service_images(sender, instance, **kwargs):
                 api_secret=settings.SERVICIOS_CLOUDINARY['API_SECRET']
             )
     except Exception as e:
-        print(f"Error eliminando imágenes de servicio {instance.id}: {e}")
\ No newline at end of file
+        print(f"Error eliminando imágenes de servicio {instance.id}: {e}")
+
+
+#########################Caché del ranking de barberías cercanas
+
+@receiver(post_init, sender=User)
+def recordar_si_era_barberia(sender, instance, **kwargs):
+    """Anota si el User se cargó siendo barbería, sin consultar (None si 'barberia' quedó diferido)."""
+    instance._era_barberia = bool(instance.__dict__['barberia']) if 'barberia' in instance.__dict__ else None
+
+
+def _es_o_era_barberia(instance):
+    return getattr(instance, '_era_barberia', None) is not False or bool(instance.barberia)
+
+
+def _toca_campos(update_fields, campos):
+    return update_fields is None or not campos.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=User)
+def guardar_estado_en_ranking(sender, instance, update_fields=None, **kwargs):
+    """Guarda la ubicación, activación y rating anteriores para comparar en post_save."""
+    instance._estado_en_ranking_anterior = None
+    if not instance.pk:
+        return
+    if not _toca_campos(update_fields, CAMPOS_USER_RANKING) or not _es_o_era_barberia(instance):
+        return  # p. ej. update_last_login, o un cliente: no aparece en ningún ranking
+    anterior = User.objects.filter(pk=instance.pk).values(
+        'ubicacion_coordenadas', 'is_active', 'barberia'
+    ).first()
+    if anterior:
+        instance._estado_en_ranking_anterior = estado_en_ranking(
+            anterior['ubicacion_coordenadas'], anterior['is_active'], anterior['barberia']
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidar_ranking_al_guardar(sender, instance, update_fields=None, **kwargs):
+    """
+    Si una barbería cambió de ubicación, de activación o de rating, se borra el
+    ranking cacheado de su celda (y vecinas), antes y después del cambio.
+    """
+    if not _toca_campos(update_fields, CAMPOS_USER_RANKING) or not _es_o_era_barberia(instance):
+        return
+    anterior = getattr(instance, '_estado_en_ranking_anterior', None)
+    cambio_en_ranking(
+        anterior, estado_en_ranking(instance.ubicacion_coordenadas, instance.is_active, instance.barberia)
+    )
+
+
+@receiver(post_delete, sender=User)
+def invalidar_ranking_al_eliminar(sender, instance, **kwargs):
+    if instance.barberia:
+        invalidar_ranking_cercano(estado_en_ranking(instance.ubicacion_coordenadas, True, instance.barberia)[0])
+
+
+#########################Rating incremental de las barberías
+
+@receiver(pre_save, sender=Comment)
+def guardar_rating_anterior(sender, instance, **kwargs):
+    instance._rating_anterior = None
+    if instance.pk:
+        instance._rating_anterior = Comment.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def sumar_rating_al_guardar(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_rating_anterior', None)
+    if anterior != instance.rating:
+        aplicar_cambio_rating(instance.barberia_id, antes=anterior, despues=instance.rating)
+
+
+@receiver(post_delete, sender=Comment)
+def restar_rating_al_eliminar(sender, instance, **kwargs):
+    aplicar_cambio_rating(instance.barberia_id, antes=instance.rating)
+
+
+#########################Colección derivada 'barber_cards'
+
+@receiver(post_save, sender=User)
+def actualizar_tarjeta_de_barberia(sender, instance, update_fields=None, **kwargs):
+    if not _toca_campos(update_fields, CAMPOS_USER_TARJETA):
+        return  # p. ej. solo last_login o la contraseña
+    if not _es_o_era_barberia(instance):
+        return  # Los clientes no tienen tarjeta
+    datos = datos_de_usuario(instance)
+    if datos is None:
+        eliminar_tarjeta(instance.pk)  # Barbería desactivada o sin perfil
+    elif not tarjeta_al_dia(instance, datos):
+        actualizar_tarjeta(instance)
+
+
+@receiver(post_delete, sender=User)
+def eliminar_tarjeta_de_barberia(sender, instance, **kwargs):
+    eliminar_tarjeta(instance.pk)
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def actualizar_tarjeta_por_relacion(sender, instance, **kwargs):
+    """
+    Los servicios cambian el contador y el precio mínimo de la tarjeta.
+    (Los comentarios la actualizan con $inc desde api.ratings.)
+    """
+    actualizar_tarjeta(instance.barberia_id)
+
+
+#########################Mapas de bits de ocupación
+
+def _lugar_ocupado(fecha_turno, turno, estado):
+    """(fecha, turno) que ocupa un turno reservado; los cancelados no ocupan lugar."""
+    return (fecha_turno, turno) if estado == 'R' else None
+
+
+@receiver(pre_save, sender=Turnos)
+def guardar_turno_anterior(sender, instance, **kwargs):
+    """Guarda el lugar que ocupaba el turno para mover el bit de ocupación en post_save."""
+    instance._turno_anterior = None
+    if instance.pk:
+        anterior = Turnos.objects.filter(pk=instance.pk).values_list('fecha_turno', 'turno', 'estado').first()
+        if anterior:
+            instance._turno_anterior = _lugar_ocupado(*anterior)
+
+
+@receiver(post_save, sender=Turnos)
+def ocupar_turno(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_turno_anterior', None)
+    actual = _lugar_ocupado(instance.fecha_turno, instance.turno, instance.estado)
+    if anterior == actual:
+        return
+    if anterior:
+        liberar(instance.barberia_id, *anterior)
+    if actual:
+        ocupar(instance.barberia_id, *actual)
+
+
+@receiver(post_delete, sender=Turnos)
+def liberar_turno(sender, instance, **kwargs):
+    # Un turno cancelado no ocupa el bit (que puede ser de otra reserva del mismo lugar)
+    if instance.estado == 'R':
+        liberar(instance.barberia_id, instance.fecha_turno, instance.turno)
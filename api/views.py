@@ -1,4 +1,4 @@
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, status, generics
 from api.serializers import *
 import os
@@ -15,8 +15,20 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExam
 
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 
 from api.permissions import *
+from api.geo import BarberiasPorProximidad, punto_de_usuario
+from api.distancias import distancias_por_barberia
+from api.ratings import histograma
+from api.disponibilidad import turnos_libres_por_fecha, fechas_laborables, DIAS_SEMANA
+from api.limpieza import archivar_turnos
+from api.reservas import reservar_turnos, INVALIDO, OCUPADO
+from api.barber_cards import tarjetas
+from api.mongo import coleccion
+from bson import ObjectId
+from api import geohash
+from api.pagination import ProximidadCursorPagination
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
@@ -25,8 +37,6 @@ from djoser import signals
 from djoser.conf import settings as djoser_settings
 from djoser.views import UserViewSet
 
-from math import radians, sin, cos, sqrt, atan2
-
 from django.contrib.auth.tokens import default_token_generator
 from rest_framework.views import APIView
 
@@ -396,9 +406,23 @@ class ConvertGoogleUserToBarberiaView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+# clusters: lado máximo (en grados) del bbox que además se filtra con un polígono $geoWithin,
+# y margen que se le agrega al polígono por la curvatura de sus lados
+MAX_GRADOS_POLIGONO_CLUSTERS = 2
+MARGEN_POLIGONO_CLUSTERS = 0.01
+
 @extend_schema_view(
     list=extend_schema(tags=['Barberias'],
-        summary="Obtener datos de todas las barberias",),
+        summary="Obtener datos de todas las barberias",
+        parameters=[
+            OpenApiParameter(
+                name='view',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                enum=['card'],
+                description='Usar "card" para recibir solo los datos de la tarjeta del listado'
+            ),
+        ],),
     retrieve=extend_schema(tags=['Barberias'], 
        summary="Obtener datos de mi barberia",),
     create=extend_schema(
@@ -525,96 +549,51 @@ class BarberiaViewSet(viewsets.ModelViewSet):
 
     parser_classes = [JSONParser, FormParser, MultiPartParser]
 
+    # Paginación por cursor (distancia/rating + _id): cada página es una consulta acotada
+    pagination_class = ProximidadCursorPagination
+
     ##Aqui indico que barberias quiero ver...
     def get_queryset(self):
-        user = self.request.user
-        
         # Query base: solo barberías activas
         queryset = User.objects.filter(
             barberia__isnull=False, 
             is_active=True
         ).exclude(barberia=[])
-        
-        # Ordenar por proximidad si el usuario tiene coordenadas
-        if self.action == 'list' and user.is_authenticated:
-            if hasattr(user, 'ubicacion_coordenadas') and user.ubicacion_coordenadas:
-                try:
-                    # Extraer coordenadas del usuario
-                    user_coords = user.ubicacion_coordenadas.get('coordinates', [])
-                    if len(user_coords) == 2:
-                        user_lng, user_lat = user_coords
-                        
-                        # 🔥 SEPARAR barberías CON y SIN coordenadas
-                        barberias_con_coordenadas = []
-                        barberias_sin_coordenadas = []
-                        
-                        for barberia in queryset:
-                            # Obtener el rating para todas las barberías
-                            rating = 0
-                            if barberia.barberia and isinstance(barberia.barberia, list) and len(barberia.barberia) > 0:
-                                rating = barberia.barberia[0].get('rating', 0)
-                            
-                            if (barberia.ubicacion_coordenadas and 
-                                barberia.ubicacion_coordenadas.get('coordinates')):
-                                
-                                barberia_coords = barberia.ubicacion_coordenadas['coordinates']
-                                if len(barberia_coords) == 2:
-                                    barberia_lng, barberia_lat = barberia_coords
-                                    
-                                    # Calcular distancia
-                                    distancia = self.calcular_distancia(
-                                        user_lat, user_lng, barberia_lat, barberia_lng
-                                    )
-                                    
-                                    barberias_con_coordenadas.append({
-                                        'barberia': barberia,
-                                        'distancia': distancia,
-                                        'rating': rating
-                                    })
-                                    continue
-                            
-                            # Si no tiene coordenadas, agregar a la lista sin coordenadas
-                            barberias_sin_coordenadas.append({
-                                'barberia': barberia,
-                                'distancia': None,
-                                'rating': rating
-                            })
-                        
-                        # 🔥 ORDENAR barberías CON coordenadas por distancia (más cercanas primero)
-                        barberias_con_coordenadas.sort(key=lambda x: x['distancia'])
-                        
-                        # 🔥 ORDENAR barberías SIN coordenadas por rating (mejores primero)
-                        barberias_sin_coordenadas.sort(key=lambda x: x['rating'], reverse=True)
-                        
-                        # 🔥 COMBINAR: primero las con coordenadas, luego las sin coordenadas
-                        resultado_final = barberias_con_coordenadas + barberias_sin_coordenadas
-                        
-                        return [item['barberia'] for item in resultado_final]
-                        
-                except (ValueError, TypeError, AttributeError) as e:
-                    print(f"Error calculando distancias: {e}")
-                    # Si hay error, continuar con ordenamiento por rating para todas
-        
-            # 🔥 FALLBACK: Ordenar todas las barberías por rating si no hay coordenadas o hay error
-            barberias_con_rating = []
-            
-            for barberia in queryset:
-                rating = 0
-                if barberia.barberia and isinstance(barberia.barberia, list) and len(barberia.barberia) > 0:
-                    rating = barberia.barberia[0].get('rating', 0)
-                    
-                barberias_con_rating.append({
-                    'barberia': barberia,
-                    'rating': rating
-                })
-            
-            barberias_con_rating.sort(key=lambda x: x['rating'], reverse=True)
-            return [item['barberia'] for item in barberias_con_rating]
-        
-        # Si no está autenticado o no es list, devolver queryset normal
         return queryset
-                
-        
+
+    def es_vista_card(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'card'
+
+    def get_serializer_class(self):
+        if self.es_vista_card():
+            return BarberiaCardSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        barberias = page if page is not None else list(queryset)
+
+        # 🔥 Distancias de toda la página en una sola pasada (en vez de una por barbería)
+        context = self.get_serializer_context()
+        context['distancias_km'] = distancias_por_barberia(request.user, barberias)
+
+        serializer = self.get_serializer(barberias, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def paginate_queryset(self, queryset):
+        # 🔥 En 'list' el orden por proximidad (o por rating si el usuario no tiene
+        # coordenadas) se resuelve en MongoDB con $geoNear, página por página y por cursor
+        if self.action == 'list' and self.request.user.is_authenticated:
+            # En modo tarjeta la página sale directo de 'barber_cards', sin cargar los User
+            queryset = BarberiasPorProximidad(
+                None if self.es_vista_card() else queryset,
+                punto=punto_de_usuario(self.request.user),
+                usar_cache=True,  # ranking compartido por celda de geohash
+            )
+        return super().paginate_queryset(queryset)
     
     #por si quiero que solamente las mismas barberias vean su info
     #def get_permissions(self):
@@ -733,7 +712,7 @@ class BarberiaViewSet(viewsets.ModelViewSet):
                 name='city', 
                 type=OpenApiTypes.STR, 
                 location=OpenApiParameter.QUERY,
-                description='Filtrar por ciudad'
+                description='Filtrar por ciudad (busca en la dirección de la barbería)'
             )
         ],
         tags=['Barberias']
@@ -746,7 +725,6 @@ class BarberiaViewSet(viewsets.ModelViewSet):
         # Obtener parámetros de la query
         lat = request.query_params.get('lat')
         lng = request.query_params.get('lng')
-        radius = float(request.query_params.get('radius', 10))  # Radio default: 10km
         city = request.query_params.get('city')
         
         # Validar parámetros
@@ -759,79 +737,148 @@ class BarberiaViewSet(viewsets.ModelViewSet):
         try:
             user_lat = float(lat)
             user_lng = float(lng)
+            radius = float(request.query_params.get('radius', 10))  # Radio default: 10km
         except ValueError:
             return Response(
-                {"error": "Latitud y longitud deben ser números válidos"},
+                {"error": "Latitud, longitud y radio deben ser números válidos"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # $geoNear rechaza coordenadas fuera de rango o un radio negativo (sería un 500)
+        if not (-90 <= user_lat <= 90 and -180 <= user_lng <= 180 and 0 < radius < float('inf')):
+            return Response(
+                {"error": "La latitud debe estar entre -90 y 90, la longitud entre -180 y 180 y el radio ser mayor que 0"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Query base: solo barberías activas
-        queryset = User.objects.filter(
-            barberia__isnull=False, 
-            is_active=True
-        ).exclude(barberia=[])
+        # 'barber_cards' solo tiene barberías activas, así que no hace falta filtro base
+        filtro = {}
         
-        # Filtrar por ciudad si se especifica
+        # El modelo User no tiene campo 'city': se filtra por la dirección de la barbería
         if city:
-            queryset = queryset.filter(city__iexact=city)
-        
-        # Si tenemos coordenadas, calcular distancias
-        barberias_con_distancia = []
+            filtro['address'] = {'$regex': re.escape(city), '$options': 'i'}
         
-        for barberia in queryset:
-            if barberia.location and barberia.location.get('coordinates'):
-                barberia_lat, barberia_lng = barberia.location['coordinates']
-                
-                # Calcular distancia (fórmula Haversine)
-                distancia_km = self.calcular_distancia(
-                    user_lat, user_lng, barberia_lat, barberia_lng
-                )
-                
-                # Solo incluir barberías dentro del radio
-                if distancia_km <= radius:
-                    barberias_con_distancia.append({
-                        'barberia': barberia,
-                        'distancia_km': round(distancia_km, 2)
-                    })
-        
-        # Ordenar por distancia
-        barberias_con_distancia.sort(key=lambda x: x['distancia_km'])
+        # 🔥 El radio, el orden por distancia, el skip y el limit se resuelven en MongoDB ($geoNear)
+        barberias = BarberiasPorProximidad(
+            self.get_queryset(),
+            punto=(user_lng, user_lat),  # GeoJSON: [lng, lat]
+            radio_km=radius,
+            filtro=filtro,
+        )
         
         # Paginación
-        page = self.paginate_queryset(barberias_con_distancia)
-        if page is not None:
-            serializer = BarberiaCercanaSerializer(
-                [item['barberia'] for item in page], 
-                many=True,
-                context={'distancias': {item['barberia'].id: item['distancia_km'] for item in page}}
-            )
-            return self.get_paginated_response(serializer.data)
-        
+        page = self.paginate_queryset(barberias)
         serializer = BarberiaCercanaSerializer(
-            [item['barberia'] for item in barberias_con_distancia],
+            page, 
             many=True,
-            context={'distancias': {item['barberia'].id: item['distancia_km'] for item in barberias_con_distancia}}
+            context={
+                'request': request,
+                'distancias': barberias.distancias,
+                'distancias_km': distancias_por_barberia(request.user, page),
+            }
         )
-        
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
     
-    def calcular_distancia(self, lat1, lng1, lat2, lng2):
-        """Calcula distancia entre dos puntos usando fórmula Haversine"""
-        
-        R = 6371  # Radio de la Tierra en km
-        
-        lat1_rad = radians(lat1)
-        lng1_rad = radians(lng1)
-        lat2_rad = radians(lat2)
-        lng2_rad = radians(lng2)
-        
-        dlng = lng2_rad - lng1_rad
-        dlat = lat2_rad - lat1_rad
-        
-        a = sin(dlat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlng/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        return R * c
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='bbox', 
+                type=OpenApiTypes.STR, 
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description='Área visible del mapa: min_lng,min_lat,max_lng,max_lat'
+            ),
+            OpenApiParameter(
+                name='zoom', 
+                type=OpenApiTypes.FLOAT, 
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description='Nivel de zoom del mapa (0-20)'
+            ),
+        ],
+        summary="Agrupar barberías por celda de geohash para el mapa",
+        tags=['Barberias']
+    )
+    @action(detail=False, methods=['get'], url_path='clusters')
+    def clusters(self, request):
+        """
+        Devuelve, por cada celda de geohash dentro del área visible, cuántas barberías
+        hay, su centroide y el mejor rating. Todo se agrega en MongoDB.
+        """
+        try:
+            min_lng, min_lat, max_lng, max_lat = [float(v) for v in request.query_params.get('bbox', '').split(',')]
+            # Los mapas mandan zoom fraccionario (p. ej. 12.7)
+            zoom = round(float(request.query_params.get('zoom')))
+        except (TypeError, ValueError, OverflowError):
+            return Response(
+                {"error": "Se requieren los parámetros bbox=min_lng,min_lat,max_lng,max_lat y zoom"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+            return Response(
+                {"error": "bbox fuera de rango o con los límites invertidos"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        precision = geohash.precision_para_zoom(zoom)
+        ancho, alto = geohash.tamano_celda(precision)
+        max_i, max_j = geohash.max_indices(precision)
+
+        # El bbox del mapa es un rectángulo en lng/lat: el filtro exacto es por rango de coordenadas
+        filtro = {
+            'location.coordinates.0': {'$gte': min_lng, '$lte': max_lng},
+            'location.coordinates.1': {'$gte': min_lat, '$lte': max_lat},
+        }
+        if max_lng - min_lng <= MAX_GRADOS_POLIGONO_CLUSTERS and max_lat - min_lat <= MAX_GRADOS_POLIGONO_CLUSTERS:
+            # Áreas pequeñas: además un $geoWithin para usar el índice 2dsphere de 'barber_cards'.
+            # MongoDB traza los lados del polígono como arcos de círculo máximo, que se curvan
+            # hacia el polo; con el margen el polígono contiene todo el rectángulo y el
+            # filtro por rango descarta lo que sobra.
+            margen = MARGEN_POLIGONO_CLUSTERS
+            oeste, sur = max(min_lng - margen, -180), max(min_lat - margen, -90)
+            este, norte = min(max_lng + margen, 180), min(max_lat + margen, 90)
+            filtro['location'] = {'$geoWithin': {'$geometry': {
+                'type': 'Polygon',
+                'coordinates': [[
+                    [oeste, sur], [este, sur], [este, norte],
+                    [oeste, norte], [oeste, sur],
+                ]],
+            }}}
+
+        pipeline = [
+            {'$match': filtro},
+            {'$project': {
+                'lng': {'$arrayElemAt': ['$location.coordinates', 0]},
+                'lat': {'$arrayElemAt': ['$location.coordinates', 1]},
+                'rating': 1,
+            }},
+            {'$group': {
+                '_id': {
+                    'i': {'$min': [{'$floor': {'$divide': [{'$add': ['$lng', 180]}, ancho]}}, max_i]},
+                    'j': {'$min': [{'$floor': {'$divide': [{'$add': ['$lat', 90]}, alto]}}, max_j]},
+                },
+                'total': {'$sum': 1},
+                'lng': {'$avg': '$lng'},
+                'lat': {'$avg': '$lat'},
+                'mejor_rating': {'$max': '$rating'},
+            }},
+        ]
+
+        clusters = [
+            {
+                'geohash': geohash.codificar_celda(int(celda['_id']['i']), int(celda['_id']['j']), precision),
+                'total': celda['total'],
+                'centroide': {'lat': round(celda['lat'], 6), 'lng': round(celda['lng'], 6)},
+                'mejor_rating': celda.get('mejor_rating'),
+            }
+            for celda in tarjetas().aggregate(pipeline)
+        ]
+
+        return Response({
+            'precision': precision,
+            'clusters': clusters,
+        })
     
         
 ###################################3333333#Comentariose###############################################
@@ -911,12 +958,57 @@ class ComentarioViewSet(viewsets.ModelViewSet):
     def by_barberia(self, request, barber_id=None):
         try:
             barberia_instance = User.objects.get(id=barber_id, barberia__isnull=False)
-            comments = Comment.objects.filter(barberia=barberia_instance)
-            serializer = self.get_serializer(comments, many=True)
-            return Response(serializer.data)
         except (User.DoesNotExist, ValueError):
             raise Http404("Barbería no encontrada o ID inválido.")
 
+        # 🔥 Paginado sobre el índice (barberia, -date)
+        comments = Comment.objects.filter(barberia=barberia_instance).order_by('-date')
+        page = self.paginate_queryset(comments)
+        comments = page if page is not None else list(comments)
+
+        # Los clientes de la página en una sola consulta, y la barbería ya cargada,
+        # en vez de una consulta por comentario en get_cliente/get_barberia
+        context = self.get_serializer_context()
+        context['barberias'] = {barberia_instance.pk: barberia_instance}
+        context['clientes'] = User.objects.only('id', 'username').in_bulk(
+            {comment.cliente_id for comment in comments}
+        )
+
+        serializer = self.get_serializer(comments, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @extend_schema(
+        summary="Resumen de calificaciones de una barbería (promedio y estrellas 1-5)",
+        parameters=[
+            {
+                "name": "barber_id",
+                "type": "string",
+                "required": True,
+                "in": "path"
+            }
+        ],
+        tags=['Comentarios']
+    )
+    @action(detail=False, methods=['get'], url_path='barberia/(?P<barber_id>[0-9a-fA-F]{24})/summary')
+    def summary(self, request, barber_id=None):
+        # 🔥 Un solo documento: los acumulados se mantienen con $inc (api.ratings)
+        doc = coleccion(User).find_one(
+            {'_id': ObjectId(barber_id), 'barberia.0': {'$exists': True}},
+            {'barberia.rating': 1, 'barberia.rating_count': 1, 'barberia.rating_hist': 1},
+        )
+        if doc is None:
+            raise Http404("Barbería no encontrada o ID inválido.")
+
+        perfil = doc['barberia'][0] if isinstance(doc['barberia'][0], dict) else {}
+        return Response({
+            'barberia': barber_id,
+            'rating': perfil.get('rating'),
+            'total': perfil.get('rating_count', 0),
+            'histograma': histograma(perfil.get('rating_hist')),
+        })
+
     def get_object(self):
         obj = super().get_object()
         self.check_object_permissions(self.request, obj)
@@ -944,10 +1036,37 @@ class ComentarioViewSet(viewsets.ModelViewSet):
     
 ###··············####################################################3Turnos    
 
+# Horizonte máximo del calendario de disponibilidad (?weeks=N)
+MAX_SEMANAS_DISPONIBILIDAD = 8
+# Máximo de turnos que devuelve turnos/siguiente/<id>/?k=N
+MAX_SIGUIENTES_TURNOS = 20
+# Lotes que archiva como máximo cada llamada a turnos/old/<token>/ (el resto, en la próxima)
+MAX_LOTES_ARCHIVO_POR_LLAMADA = 4
+
 @extend_schema_view(
     list=extend_schema(
         tags=['Turnos'],
         summary="Obtener la lista de todos mis turnos",
+        parameters=[
+            OpenApiParameter(
+                name='desde',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Solo turnos desde esta fecha, inclusive (dd/mm/aaaa)'
+            ),
+            OpenApiParameter(
+                name='hasta',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Solo turnos hasta esta fecha, inclusive (dd/mm/aaaa)'
+            ),
+            OpenApiParameter(
+                name='upcoming',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description='Sin "desde", solo los turnos de hoy en adelante (default: true). Con false se listan también los pasados'
+            ),
+        ],
     ),
     retrieve=extend_schema(
         tags=['Turnos'],
@@ -992,13 +1111,43 @@ class TurnoViewSet(viewsets.ModelViewSet):
 
         # Si el usuario es un staff (admin), le mostramos todo
         if user.is_staff:
-            return Turnos.objects.all()
+            queryset = Turnos.objects.all()
         # Si el usuario es una barbería, le mostramos todos los turnos que tiene asignados
         elif user.barberia is not None:
-            return Turnos.objects.filter(barberia=user)
+            queryset = Turnos.objects.filter(barberia=user)
         # Si el usuario es un cliente, le mostramos todos los turnos que ha solicitado
         else:
-            return Turnos.objects.filter(cliente=user)
+            queryset = Turnos.objects.filter(cliente=user)
+
+        if self.action == 'list':
+            queryset = self._filtrar_ventana_de_fechas(queryset)
+        return queryset
+
+    def _filtrar_ventana_de_fechas(self, queryset):
+        """
+        Acota el listado con ?desde=/?hasta= (dd/mm/aaaa, inclusive). Sin 'desde' solo
+        se listan los turnos de hoy en adelante, salvo ?upcoming=false. El filtro por
+        fecha más el ordering (fecha_turno, turno) usan los índices
+        (cliente|barberia, fecha_turno, turno), así el historial no frena el listado.
+        """
+        params = self.request.query_params
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            valor = params.get(nombre)
+            if not valor:
+                continue
+            try:
+                fechas[nombre] = datetime.datetime.strptime(valor, "%d/%m/%Y").date()
+            except ValueError:
+                raise ValidationError({nombre: "La fecha debe tener el formato dd/mm/aaaa"})
+
+        if 'desde' in fechas:
+            queryset = queryset.filter(fecha_turno__gte=fechas['desde'])
+        elif params.get('upcoming', 'true').lower() not in ('0', 'false'):
+            queryset = queryset.filter(fecha_turno__gte=date.today())
+        if 'hasta' in fechas:
+            queryset = queryset.filter(fecha_turno__lte=fechas['hasta'])
+        return queryset
 
     def get_permissions(self):
         if self.action == 'create':
@@ -1019,11 +1168,65 @@ class TurnoViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @extend_schema(
+        tags=['Turnos'],
+        summary="Reservar varios turnos en un solo pedido",
+        request=TurnoBulkSerializer,
+    )
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Reserva varios pares (dia, turno) en una barbería: el perfil se carga una vez,
+        los lugares ocupados se leen de una sola consulta y los turnos se insertan
+        juntos. Devuelve el resultado de cada pedido (reservado, ocupado o invalido).
+        """
+        serializer = TurnoBulkSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        barberia_instance = serializer.validated_data['barberia_id']
+        barberia_data = barberia_instance.barberia[0]
+
+        resultados, validos = [], []
+        for pedido in serializer.validated_data['turnos']:
+            resultado = {'dia': pedido['dia'], 'turno': pedido['turno']}
+            try:
+                resultado['fecha_turno'] = validar_pedido_turno(barberia_data, pedido['dia'], pedido['turno'])
+                validos.append(resultado)
+            except ValidationError as e:
+                resultado['estado'] = INVALIDO
+                resultado['error'] = e.detail
+            resultados.append(resultado)
+
+        reservados = reservar_turnos(barberia_instance, request.user, validos) if validos else 0
+
+        for resultado in validos:
+            resultado['fecha_turno'] = resultado['fecha_turno'].strftime("%d/%m/%Y")
+
+        if reservados:
+            codigo = status.HTTP_201_CREATED
+        elif any(resultado['estado'] == OCUPADO for resultado in resultados):
+            codigo = status.HTTP_409_CONFLICT  # Algún lugar pedido ya estaba tomado
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST  # Todos los pedidos eran inválidos
+
+        return Response({
+            'barberia': barberia_data.get('name_barber'),
+            'reservados': reservados,
+            'resultados': resultados,
+        }, status=codigo)
+
         
     
     @extend_schema(
         tags=['Turnos'],
         summary="Endpoint para conocer cuales son los turnos disponibles",
+        parameters=[
+            OpenApiParameter(
+                name='weeks',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Devuelve el calendario de las próximas N semanas (1-{MAX_SEMANAS_DISPONIBILIDAD})'
+            ),
+        ],
     ) 
     @action(detail=False, methods=['get'], url_path='disponibles/(?P<barber_id>[0-9a-fA-F]{24})')
     def turnos_disponibles(self, request, barber_id=None):
@@ -1039,6 +1242,19 @@ class TurnoViewSet(viewsets.ModelViewSet):
         dias_laborables = barberia_data['horario'][0]['days']
         max_turnos = barberia_data['horario'][0]['turnos_max']
 
+        semanas = request.query_params.get('weeks')
+        if semanas is not None:
+            try:
+                semanas = int(semanas)
+            except ValueError:
+                semanas = 0
+            if not 1 <= semanas <= MAX_SEMANAS_DISPONIBILIDAD:
+                return Response(
+                    {"error": f"El parámetro weeks debe ser un número entre 1 y {MAX_SEMANAS_DISPONIBILIDAD}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return self._calendario_disponibilidad(barberia_instance.pk, barberia_data, semanas)
+
         # --- Reordenar los días según el día de hoy ---
         hoy = datetime.datetime.now().strftime("%A").lower()  # ej: "thursday"
         
@@ -1058,33 +1274,36 @@ class TurnoViewSet(viewsets.ModelViewSet):
             idx = dias_laborables.index(dia_actual)
             dias_laborables = dias_laborables[idx:] + dias_laborables[:idx]
     
-        resultados = []
-
+        fechas_por_dia = []
         for dia in dias_laborables:
             try:
-                fecha_turno = Turnos.calcular_fecha_turno(dia.lower())
-            except KeyError:
+                fechas_por_dia.append((dia, Turnos.calcular_fecha_turno(dia.lower())))
+            except (KeyError, ValueError):
                 continue  # Saltar días inválidos
 
-            # Obtener los turnos ocupados para esa fecha
-            turnos_ocupados = Turnos.objects.filter(
-                barberia=barberia_instance,
-                fecha_turno=fecha_turno
-            ).values_list('turno', flat=True)
+        # 🔥 Turnos libres de todas las fechas con una sola consulta a los mapas de ocupación
+        turnos_libres_por_dia = turnos_libres_por_fecha(
+            barberia_instance.pk,
+            [fecha for _, fecha in fechas_por_dia],
+            max_turnos,
+        )
+
+        # Horario de cada turno (tabla compilada una vez por horario)
+        horario_turnos = compilar_horario(
+            barberia_data['openingTime'],
+            barberia_data['closingTime'],
+            max_turnos,
+        )
+
+        resultados = []
 
-            # Todos los turnos posibles
-            todos_los_turnos = list(range(1, max_turnos + 1))
-            turnos_libres = [t for t in todos_los_turnos if t not in turnos_ocupados]
+        for dia, fecha_turno in fechas_por_dia:
+            turnos_libres = sorted(turnos_libres_por_dia[fecha_turno])
 
             # Calcular la hora de cada turno
             disponibilidad = []
             for t in turnos_libres:
-                inicio, fin = calcular_hora_turno(
-                    barberia_data['openingTime'],
-                    barberia_data['closingTime'],
-                    max_turnos,
-                    t
-                )
+                inicio, fin = horario_turnos[t - 1]
                 disponibilidad.append({
                     "turno": t,
                     "hora": f"{inicio} - {fin}"
@@ -1101,6 +1320,196 @@ class TurnoViewSet(viewsets.ModelViewSet):
             "turnos_por_dia": resultados
         })
 
+    @extend_schema(
+        tags=['Turnos'],
+        summary="Próximos turnos libres de una barbería",
+        parameters=[
+            OpenApiParameter(
+                name='k',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Cantidad de turnos libres a buscar (1-{MAX_SIGUIENTES_TURNOS}, default: 1)'
+            ),
+        ],
+    )
+    @action(detail=False, methods=['get'], url_path='siguiente/(?P<barber_id>[0-9a-fA-F]{24})')
+    def siguiente(self, request, barber_id=None):
+        """
+        Recorre los días laborables de la semana que se puede reservar (hoy y los 6
+        siguientes, como Turnos.calcular_fecha_turno) y se detiene apenas encuentra
+        k turnos libres.
+        """
+        try:
+            k = int(request.query_params.get('k', 1))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= MAX_SIGUIENTES_TURNOS:
+            return Response(
+                {"error": f"El parámetro k debe ser un número entre 1 y {MAX_SIGUIENTES_TURNOS}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            barberia_instance = User.objects.get(id=barber_id, barberia__isnull=False)
+        except User.DoesNotExist:
+            raise Http404("Barbería no encontrada")
+
+        barberia_data = barberia_instance.barberia[0]
+        max_turnos = barberia_data['horario'][0]['turnos_max']
+        horario_turnos = compilar_horario(
+            barberia_data['openingTime'], barberia_data['closingTime'], max_turnos
+        )
+
+        ahora = datetime.datetime.now()
+        hora_actual = ahora.strftime("%H:%M")
+        cruza_medianoche = barberia_data['closingTime'] <= barberia_data['openingTime']
+
+        # Reservar por 'dia' solo llega a la próxima ocurrencia de ese día de la semana
+        fechas_por_dia = fechas_laborables(barberia_data['horario'][0]['days'], ahora.date(), 7)
+        turnos_libres_por_dia = turnos_libres_por_fecha(
+            barberia_instance.pk, [fecha for _, fecha in fechas_por_dia], max_turnos
+        )
+
+        encontrados = []
+        for dia, fecha_turno in fechas_por_dia:
+            for t in sorted(turnos_libres_por_dia[fecha_turno]):
+                inicio, fin = horario_turnos[t - 1]
+                if fecha_turno == ahora.date() and not cruza_medianoche and inicio < hora_actual:
+                    continue  # Ese turno de hoy ya empezó
+                encontrados.append({
+                    "dia": dia,
+                    "fecha_turno": fecha_turno.strftime("%d/%m/%Y"),
+                    "turno": t,
+                    "hora": f"{inicio} - {fin}"
+                })
+                if len(encontrados) == k:
+                    break
+            if len(encontrados) == k:
+                break
+
+        return Response({
+            "barberia": barberia_data['name_barber'],
+            "siguientes": encontrados
+        })
+
+    @extend_schema(
+        tags=['Turnos'],
+        summary="Agenda de la barbería autenticada (un día o una semana)",
+        parameters=[
+            OpenApiParameter(
+                name='fecha',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Día de la agenda en formato dd/mm/aaaa (default: hoy)'
+            ),
+            OpenApiParameter(
+                name='semana',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description='Si es true, devuelve los 7 días a partir de la fecha'
+            ),
+        ],
+    )
+    @action(detail=False, methods=['get'], url_path='agenda')
+    def agenda(self, request):
+        """
+        Turnos reservados de la barbería en el día (o la semana) pedido, ordenados por
+        fecha y turno. Dos consultas en total: los turnos y sus clientes en un solo
+        in_bulk; la hora de cada turno sale de la tabla compilada del horario.
+        """
+        barberia = request.user
+        if not barberia.barberia:
+            return Response(
+                {"error": "Solo las barberías tienen agenda"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        fecha = request.query_params.get('fecha')
+        try:
+            desde = datetime.datetime.strptime(fecha, "%d/%m/%Y").date() if fecha else date.today()
+        except ValueError:
+            return Response(
+                {"error": "El parámetro fecha debe tener el formato dd/mm/aaaa"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        semana = request.query_params.get('semana', '').lower() in ('1', 'true')
+        hasta = desde + timedelta(days=7 if semana else 1)
+
+        turnos = list(
+            Turnos.objects
+            .filter(barberia=barberia, fecha_turno__gte=desde, fecha_turno__lt=hasta, estado='R')
+            .order_by('fecha_turno', 'turno')
+            .only('id', 'cliente', 'fecha_turno', 'turno', 'estado')
+        )
+        clientes = User.objects.only('id', 'username').in_bulk({t.cliente_id for t in turnos})
+
+        barberia_data = barberia.barberia[0]
+        horario_turnos = compilar_horario(
+            barberia_data['openingTime'],
+            barberia_data['closingTime'],
+            barberia_data['horario'][0]['turnos_max'],
+        )
+
+        dias = {}
+        for turno in turnos:
+            cliente = clientes.get(turno.cliente_id)
+            # Si se achicó turnos_max, los turnos viejos fuera de la tabla quedan sin hora
+            hora = "%s - %s" % horario_turnos[turno.turno - 1] if turno.turno <= len(horario_turnos) else None
+            dias.setdefault(turno.fecha_turno, []).append({
+                "id": str(turno.id),
+                "turno": turno.turno,
+                "hora": hora,
+                "estado": turno.estado,
+                "cliente": {"username": cliente.username} if cliente else None,
+            })
+
+        return Response({
+            "barberia": barberia_data.get('name_barber'),
+            "desde": desde.strftime("%d/%m/%Y"),
+            "hasta": (hasta - timedelta(days=1)).strftime("%d/%m/%Y"),
+            "dias": [
+                {
+                    "dia": DIAS_SEMANA[fecha_turno.weekday()],
+                    "fecha_turno": fecha_turno.strftime("%d/%m/%Y"),
+                    "turnos": turnos_del_dia,
+                }
+                for fecha_turno, turnos_del_dia in dias.items()
+            ],
+        })
+
+    def _calendario_disponibilidad(self, barberia_id, barberia_data, semanas):
+        """
+        Calendario de varias semanas: una consulta a los mapas de ocupación para todo el
+        rango de fechas y la tabla de horarios compilada; el JSON se envía día por día.
+        """
+        max_turnos = barberia_data['horario'][0]['turnos_max']
+        fechas_por_dia = fechas_laborables(
+            barberia_data['horario'][0]['days'], date.today(), semanas * 7
+        )
+        turnos_libres_por_dia = turnos_libres_por_fecha(
+            barberia_id, [fecha for _, fecha in fechas_por_dia], max_turnos
+        )
+        horario_turnos = compilar_horario(
+            barberia_data['openingTime'], barberia_data['closingTime'], max_turnos
+        )
+
+        def generar():
+            yield '{"barberia": %s, "semanas": %d, "turnos_por_dia": [' % (
+                json.dumps(barberia_data['name_barber']), semanas
+            )
+            for indice, (dia, fecha_turno) in enumerate(fechas_por_dia):
+                yield (',' if indice else '') + json.dumps({
+                    "dia": dia,
+                    "fecha_turno": fecha_turno.strftime("%d/%m/%Y"),
+                    "disponibles": [
+                        {"turno": t, "hora": "%s - %s" % horario_turnos[t - 1]}
+                        for t in sorted(turnos_libres_por_dia[fecha_turno])
+                    ],
+                })
+            yield ']}'
+
+        return StreamingHttpResponse(generar(), content_type='application/json')
+
 
 @extend_schema(
     tags=['Turnos'],
@@ -1118,14 +1527,15 @@ def delete_old_turnos_view(request, token):
         return Response({'detail': 'Token de autenticación inválido.'}, status=status.HTTP_401_UNAUTHORIZED)
 
     try:
-        ayer = date.today() - timedelta(days=1)
-        turnos_a_borrar = Turnos.objects.filter(fecha_turno__lte=ayer)
-        num_turnos_borrados = turnos_a_borrar.count()
-        turnos_a_borrar.delete()
+        # Los turnos vencidos se mueven a 'turnos_archive', solo unos pocos lotes acotados por llamada
+        num_turnos_borrados, pendientes = archivar_turnos(
+            tamano_lote=500, max_lotes=MAX_LOTES_ARCHIVO_POR_LLAMADA
+        )
 
         return Response({
-            'detail': f'Se eliminaron {num_turnos_borrados} turnos antiguos.',
-            'count': num_turnos_borrados
+            'detail': f'Se archivaron {num_turnos_borrados} turnos antiguos.',
+            'count': num_turnos_borrados,
+            'pendientes': pendientes,
         }, status=status.HTTP_200_OK)
     
     except Exception as e:
@@ -244,6 +244,18 @@ DATABASES = {"default": django_mongodb_backend.parse_uri(config('MONGODB_URI'))}
 # https://docs.djangoproject.com/en/dev/ref/settings/#database-routers
 DATABASE_ROUTERS = ["django_mongodb_backend.routers.MongoRouter", "barberstein.routers.PermissionRouter"]
 
+# Cache
+# https://django-mongodb-backend.readthedocs.io/en/latest/topics/cache/
+# Compartida entre todas las instancias de Vercel (una LocMemCache sería una por proceso).
+# Sus índices (TTL y clave única) se crean en la migración api/0015_coleccion_cache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_mongodb_backend.cache.MongoDBCache',
+        'LOCATION': 'django_cache',
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 